@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+import sql
+import tde
+import argparse
+import ConfigParser
+import json
+import logging
+import sys
+import time
+from multiprocessing import Process, Queue
+from os import path
+from Queue import Empty
+
+
+log = logging.getLogger(path.basename(__file__))
+log.setLevel(logging.DEBUG)
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_PER_SOURCE = 2
+# How often the runner checks for job processes that died without reporting.
+JOB_POLL_INTERVAL = 1.0
+INTEGER_OPTIONS = ('batch_size', 'partitions', 'queue_size', 'spill_rows', 'checkpoint_interval')
+BOOLEAN_OPTIONS = ('resume', 'strict')
+JOB_OPTIONS = ('batch_size', 'partition_column', 'partitions', 'queue_size', 'incremental_column', 'state_file', 'schema_cache',
+               'spill_rows', 'spill_dir', 'checkpoint_column', 'checkpoint_file', 'checkpoint_interval', 'resume',
+               'strict')
+FILE_OPTIONS = {'state_file': 'state_file_path', 'schema_cache': 'schema_cache_path', 'checkpoint_file': 'checkpoint_file_path'}
+
+
+class BatchJob(object):
+    def __init__(self, name, connection_string, sql_file_path, tde_file_path, options=None):
+        self.name = name
+        self.connection_string = connection_string
+        self.sql_file_path = sql_file_path
+        self.tde_file_path = tde_file_path
+        self.options = options or dict()
+        self.status = 'pending'
+        self.rows = 0
+        self.elapsed_time = None
+        self.queued_time = None
+        self.errors = list()
+
+    @property
+    def source_key(self):
+        parts = sql.parse_connection_string(self.connection_string)
+        for key in ('server', 'host', 'database'):
+            if key in parts:
+                return '{}={}'.format(key, parts[key].lower())
+        return self.connection_string
+
+    def get_generator(self):
+        kwargs = dict((FILE_OPTIONS.get(k, k), v) for k, v in self.options.items() if k in JOB_OPTIONS)
+        return tde.TdeGenerator(self.connection_string, self.sql_file_path, self.tde_file_path, **kwargs)
+
+    def get_report(self):
+        return {
+            'name': self.name,
+            'source': self.source_key,
+            'tde': self.tde_file_path,
+            'status': self.status,
+            'rows': self.rows,
+            'elapsed_time': self.elapsed_time,
+            'queued_time': self.queued_time,
+            'errors': self.errors,
+        }
+
+
+def _job_process(job, idx, result_queue):
+    # Each job runs in its own process: the Extract API is not thread-safe, and a job forks its own partition
+    # and CSV workers, which is only safe from a process that runs a single job.
+    try:
+        BatchRunner.run_job(job)
+    finally:
+        sql.close_pools()
+        result_queue.put([idx, job.status, job.rows, job.elapsed_time, job.errors])
+
+
+class BatchRunner(object):
+    def __init__(self, jobs, workers=DEFAULT_WORKERS, max_per_source=DEFAULT_MAX_PER_SOURCE):
+        self.jobs = jobs
+        self.workers = workers
+        self.max_per_source = max_per_source
+        self.source_running = dict((j.source_key, 0) for j in jobs)
+        self.pending = list()
+        self.start_time = None
+
+    def next_job(self):
+        # Takes the first pending job whose source has capacity, so jobs for other sources are not held up behind
+        # a busy one. Returns None when no pending job can start yet.
+        for job in self.pending:
+            if self.source_running[job.source_key] < self.max_per_source:
+                self.pending.remove(job)
+                self.source_running[job.source_key] += 1
+                job.queued_time = time.time() - self.start_time
+                return job
+        return None
+
+    def release_job(self, job):
+        self.source_running[job.source_key] -= 1
+
+    def start_jobs(self, running, result_queue):
+        while len(running) < self.workers:
+            job = self.next_job()
+            if job is None:
+                return
+            idx = self.jobs.index(job)
+            job.status = 'running'
+            running[idx] = Process(target=_job_process, args=(job, idx, result_queue))
+            running[idx].start()
+
+    def finish_job(self, running, idx, status, rows, elapsed_time, errors):
+        job = self.jobs[idx]
+        job.status = status
+        job.rows = rows
+        job.elapsed_time = elapsed_time
+        job.errors = errors
+        running.pop(idx).join()
+        self.release_job(job)
+
+    @staticmethod
+    def run_job(job):
+        job.status = 'running'
+        log.info('Starting job "{}"...'.format(job.name))
+        start_time = time.time()
+        try:
+            generator = job.get_generator()
+            generator.execute()
+            job.rows = generator.stats.rows_written
+            job.errors = generator.errors
+            job.status = 'failed' if generator.errors else 'succeeded'
+        except Exception as ex:
+            job.errors.append(ex.message or str(ex))
+            job.status = 'failed'
+            log.exception(ex.message)
+        job.elapsed_time = time.time() - start_time
+        log.info('Job "{}" {} in {:.1f}s. Rows: {}'.format(job.name, job.status, job.elapsed_time, job.rows))
+
+    def execute(self):
+        start_time = time.time()
+        self.start_time = start_time
+        self.pending = list(self.jobs)
+        running = dict()
+        exited = set()
+        result_queue = Queue()
+        try:
+            self.start_jobs(running, result_queue)
+            while running:
+                try:
+                    result = result_queue.get(timeout=JOB_POLL_INTERVAL)
+                except Empty:
+                    # A job process that exited is only given up on after a further quiet interval, in case its
+                    # result was still on its way.
+                    for idx in sorted(exited & set(running)):
+                        error = 'The job process exited with code {} before finishing.'.format(running[idx].exitcode)
+                        log.error('Job "{}" failed: {}'.format(self.jobs[idx].name, error))
+                        self.finish_job(running, idx, 'failed', 0, None, [error])
+                    exited = set(idx for idx, p in running.items() if p.exitcode is not None)
+                else:
+                    self.finish_job(running, *result)
+                self.start_jobs(running, result_queue)
+        finally:
+            for p in running.values():
+                if p.is_alive():
+                    p.terminate()
+        return {
+            'elapsed_time': time.time() - start_time,
+            'succeeded': len([j for j in self.jobs if j.status == 'succeeded']),
+            'failed': len([j for j in self.jobs if j.status != 'succeeded']),
+            'jobs': [j.get_report() for j in self.jobs],
+        }
+
+
+def load_manifest(manifest_path):
+    extension = path.splitext(manifest_path)[1].lower()
+    if extension in ('.ini', '.cfg'):
+        parser = ConfigParser.RawConfigParser()
+        if not parser.read(manifest_path):
+            raise Exception('File "{}" was not found.'.format(manifest_path))
+        entries = [dict(parser.items(section), name=section) for section in parser.sections()]
+        defaults = dict()
+    else:
+        with open(manifest_path, 'r') as f:
+            if extension in ('.yaml', '.yml'):
+                try:
+                    import yaml
+                except ImportError:
+                    raise Exception('PyYAML is required to read YAML manifests.')
+                manifest = yaml.safe_load(f)
+            else:
+                manifest = json.load(f)
+        if isinstance(manifest, list):
+            manifest = {'jobs': manifest}
+        entries = manifest.get('jobs', list())
+        defaults = manifest.get('defaults', dict())
+
+    base_path = path.dirname(path.abspath(manifest_path))
+    jobs = list()
+    for idx, entry in enumerate(entries):
+        entry = dict(defaults, **entry)
+        for key in ('cn', 'sql', 'tde'):
+            if not entry.get(key):
+                raise ValueError('Job {} in "{}" is missing "{}".'.format(entry.get('name', idx + 1), manifest_path, key))
+        options = dict()
+        for key in JOB_OPTIONS:
+            if entry.get(key) not in (None, ''):
+                options[key] = int(entry[key]) if key in INTEGER_OPTIONS else entry[key]
+                if key in BOOLEAN_OPTIONS:
+                    options[key] = sql.parse_bool(entry[key])
+                if key in FILE_OPTIONS:
+                    options[key] = path.join(base_path, options[key])
+        jobs.append(BatchJob(entry.get('name', path.splitext(path.basename(entry['tde']))[0]), entry['cn'],
+                             path.join(base_path, entry['sql']), path.join(base_path, entry['tde']), options))
+    return jobs
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='batch.py', description='Runs the SQL to TDE jobs listed in a manifest (JSON, YAML or INI) concurrently.')
+    parser.add_argument('--manifest', required=True, metavar='<manifest_file_path>', help='The manifest listing each job\'s cn, sql and tde, plus optional tde.py options (batch_size, partition_column, partitions, queue_size, incremental_column, state_file, schema_cache, spill_rows, spill_dir, checkpoint_column, checkpoint_file, checkpoint_interval, resume, strict).')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, metavar='<count>', help='The maximum number of jobs run at once, each in its own process. Default: {}'.format(DEFAULT_WORKERS))
+    parser.add_argument('--max-per-source', type=int, default=DEFAULT_MAX_PER_SOURCE, metavar='<count>', help='The maximum number of jobs run at once against the same source server. Default: {}'.format(DEFAULT_MAX_PER_SOURCE))
+    parser.add_argument('--report', metavar='<json_file_path>', help='The file path to write the per-job status and timing report to.')
+    args = vars(parser.parse_args())
+    tde.configure_logging()
+
+    jobs = load_manifest(args['manifest'])
+    try:
+        report = BatchRunner(jobs, args['workers'], args['max_per_source']).execute()
+    finally:
+        sql.close_pools()
+
+    for job in report['jobs']:
+        print '{:<30} {:<10} {:>12,} rows {:>10.1f}s'.format(job['name'], job['status'], job['rows'], job['elapsed_time'] or 0)
+    print 'Succeeded: {}  Failed: {}  Elapsed: {:.1f}s'.format(report['succeeded'], report['failed'], report['elapsed_time'])
+    if args['report']:
+        with open(args['report'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if report['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
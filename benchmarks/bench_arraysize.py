@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sql
+from bench_tde import PROFILES, create_source
+
+
+DEFAULT_ARRAYSIZES = [1, 10, 100, 1000, 5000, 10000, 50000]
+# Smaller differences than this are reported as noise rather than a better setting.
+MIN_SPEEDUP = 0.05
+
+
+def measure(connection_string, query, batch_size, arraysize, repeat):
+    helper = sql.get_helper(sql.add_connection_options(connection_string, arraysize=arraysize, pool_size=0))
+    best = None
+    for i in range(repeat):
+        start_time = time.time()
+        row_count = sum(len(rows) for rows in helper.execute_query_batches(query, batch_size))
+        elapsed = time.time() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return row_count, best
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='bench_arraysize.py', description='Sweeps cursor arraysize values, i.e. the rows returned per fetchmany() call, against a source and compares them with the default of --batch-size. pyodbc does not prefetch by arraysize, so with ODBC sources only the fetch granularity changes. Without --cn, a synthetic local SQLite source is used.')
+    parser.add_argument('--cn', metavar='<connection_string>', help='The source connection string, as passed to tde.py.')
+    parser.add_argument('--sql', metavar='<sql_script_file_path>', help='The query to fetch. Required with --cn.')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='wide', help='The synthetic table shape used without --cn. Default: wide')
+    parser.add_argument('--rows', type=int, default=100000, metavar='<rows>', help='The synthetic row count used without --cn. Default: 100000')
+    parser.add_argument('--batch-size', type=int, default=sql.DEFAULT_BATCH_SIZE, metavar='<rows>', help='The fetch batch size. Default: {}'.format(sql.DEFAULT_BATCH_SIZE))
+    parser.add_argument('--arraysizes', nargs='+', type=int, default=DEFAULT_ARRAYSIZES, metavar='<rows>', help='The arraysize values to try.')
+    parser.add_argument('--repeat', type=int, default=3, metavar='<count>', help='The runs per value; the fastest is kept. Default: 3')
+    args = vars(parser.parse_args(argv[1:]))
+
+    work_dir = None
+    if args['cn']:
+        if not args['sql']:
+            parser.error('--sql is required with --cn.')
+        connection_string = args['cn']
+        with open(args['sql'], 'r') as f:
+            query = f.read()
+    else:
+        work_dir = tempfile.mkdtemp(prefix='bench_arraysize_')
+        connection_string = create_source(os.path.join(work_dir, 'source.db'), args['profile'], args['rows'])
+        query = 'SELECT * FROM bench'
+
+    try:
+        row_count, default_elapsed = measure(connection_string, query, args['batch_size'], None, args['repeat'])
+        print 'default (arraysize {:,})  {:>12,.0f} rows/sec  {:>8.3f}s'.format(args['batch_size'], row_count / default_elapsed if default_elapsed else 0, default_elapsed)
+        results = list()
+        for arraysize in args['arraysizes']:
+            row_count, elapsed = measure(connection_string, query, args['batch_size'], arraysize, args['repeat'])
+            results.append((elapsed, arraysize))
+            print 'arraysize {:>7,}  {:>12,.0f} rows/sec  {:>8.3f}s'.format(arraysize, row_count / elapsed if elapsed else 0, elapsed)
+        elapsed, arraysize = min(results)
+        if elapsed > default_elapsed * (1 - MIN_SPEEDUP):
+            print 'No arraysize was more than {:.0%} faster than the default; keep --batch-size.'.format(MIN_SPEEDUP)
+            return
+        print 'Best arraysize: {} (use "arraysize={}" in the connection string or --arraysize {})'.format(arraysize, arraysize, arraysize)
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import argparse
+import datetime
+import decimal
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_tableausdk
+stub_tableausdk.install()
+
+import convert
+import tde
+
+
+# (label, cursor.description entry, value factory); each case is written as a table of COLUMNS such columns.
+CASES = (
+    ('int', (int, None, 10, 10, 0, True), lambda rnd, i: rnd.randint(-2**31, 2**31 - 1)),
+    ('bigint', (int, None, 19, 19, 0, True), lambda rnd, i: rnd.randint(-2**62, 2**62)),
+    ('float', (float, None, 53, 53, 0, True), lambda rnd, i: rnd.uniform(-1e6, 1e6)),
+    ('bool', (bool, None, 1, 1, 0, True), lambda rnd, i: rnd.random() < 0.5),
+    ('decimal', (decimal.Decimal, None, 18, 18, 4, True), lambda rnd, i: decimal.Decimal(rnd.randint(-10**8, 10**8)) / 10000),
+    ('decimal(18,0)', (decimal.Decimal, None, 18, 18, 0, True), lambda rnd, i: decimal.Decimal(rnd.randint(-10**17, 10**17))),
+    ('datetime', (datetime.datetime, None, 23, 23, 3, True),
+     lambda rnd, i: datetime.datetime(2015, 1, 1) + datetime.timedelta(days=rnd.randint(0, 364))),
+    ('unicode', (unicode, None, 50, 50, 0, True), lambda rnd, i: u'value {}'.format(rnd.randint(0, 5000))),
+)
+COLUMNS = 4
+NULL_RATE = 0.02
+
+
+def make_rows(make_value, count, seed=0):
+    rnd = random.Random(seed)
+    return [tuple(None if rnd.random() < NULL_RATE else make_value(rnd, i) for c in range(COLUMNS)) for i in xrange(count)]
+
+
+def measure(work_dir, metadata, rows, columnar, batch_size):
+    extract_path = os.path.join(work_dir, 'bench.tde')
+    with tde.TdeWriter(extract_path, columnar=columnar) as writer:
+        writer.set_metadata(metadata)
+        start_time = time.time()
+        for i in xrange(0, len(rows), batch_size):
+            writer.write_rows(rows[i:i + batch_size])
+        elapsed = time.time() - start_time
+    return elapsed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='bench_columnar.py', description='Compares TdeWriter throughput with per-cell and column-at-a-time conversion for each column type, against a stub extract library.')
+    parser.add_argument('--rows', type=int, default=100000, metavar='<rows>', help='The number of rows to write per run. Default: 100000')
+    parser.add_argument('--batch-size', type=int, default=10000, metavar='<rows>', help='The number of rows per write_rows() call. Default: 10000')
+    parser.add_argument('--runs', type=int, default=3, metavar='<count>', help='The best of this many runs is reported. Default: 3')
+    parser.add_argument('--no-numpy', action='store_true', help='Measure the pure Python conversions even when NumPy is installed.')
+    args = vars(parser.parse_args(argv[1:]))
+
+    if args['no_numpy']:
+        convert._numpy, convert._numpy_loaded = None, True
+    print 'NumPy: {}'.format('yes' if convert.get_numpy() is not None else 'no')
+    work_dir = tempfile.mkdtemp()
+    try:
+        for label, description, make_value in CASES:
+            metadata = [('{}_{}'.format(label, i),) + description for i in range(COLUMNS)]
+            rows = make_rows(make_value, args['rows'])
+            per_cell = min(measure(work_dir, metadata, rows, False, args['batch_size']) for run in range(args['runs']))
+            columnar = min(measure(work_dir, metadata, rows, True, args['batch_size']) for run in range(args['runs']))
+            print '{:<14} per-cell {:>10,.0f} rows/sec  columnar {:>10,.0f} rows/sec ({:.2f}x)'.format(
+                label, len(rows) / per_cell, len(rows) / columnar, per_cell / columnar)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
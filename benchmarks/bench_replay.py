@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_tableausdk
+stub_tableausdk.install()
+
+import sql
+import stage
+import tde
+from bench_tde import PROFILES, create_source
+
+
+CONFIGURATIONS = [
+    ('defaults', {}),
+    ('no columnar', {'columnar': False}),
+    ('no fast strings', {'fast_strings': False}),
+    ('no row reuse', {'reuse_row': False}),
+]
+
+
+def create_stage(stage_path, profile, row_count, batch_size, work_dir):
+    helper = sql.get_helper(create_source(os.path.join(work_dir, 'source.db'), profile, row_count))
+    with stage.StageSink(stage_path) as stage_sink:
+        for rows in helper.execute_query_batches('SELECT * FROM bench', batch_size, stage_sink.set_metadata):
+            stage_sink.write_rows(rows)
+
+
+def replay(stage_path, extract_path, options):
+    with stage.StageReader(stage_path) as reader:
+        batches = list(reader.read_batches())
+        with tde.TdeWriter(extract_path, **options) as writer:
+            writer.set_metadata(reader.metadata)
+            start_time = time.time()
+            for rows in batches:
+                writer.write_rows(rows)
+            elapsed = time.time() - start_time
+    return sum(len(b) for b in batches), elapsed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='bench_replay.py', description='Replays a stage file written by tde.py --stage into TdeWriter under several writer configurations, against a stub extract library.')
+    parser.add_argument('--stage', metavar='<stage_file_path>', help='The stage file to replay. Without it, one is built from a synthetic SQLite source.')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='wide', help='The synthetic table shape used without --stage. Default: wide')
+    parser.add_argument('--rows', type=int, default=50000, metavar='<rows>', help='The synthetic row count used without --stage. Default: 50000')
+    parser.add_argument('--batch-size', type=int, default=sql.DEFAULT_BATCH_SIZE, metavar='<rows>', help='The batch size of the synthetic stage file. Default: {}'.format(sql.DEFAULT_BATCH_SIZE))
+    args = vars(parser.parse_args(argv[1:]))
+
+    work_dir = tempfile.mkdtemp(prefix='bench_replay_')
+    try:
+        stage_path = args['stage']
+        if not stage_path:
+            stage_path = os.path.join(work_dir, 'bench.stage')
+            create_stage(stage_path, args['profile'], args['rows'], args['batch_size'], work_dir)
+        for label, options in CONFIGURATIONS:
+            row_count, elapsed = replay(stage_path, os.path.join(work_dir, 'bench.tde'), options)
+            print '{:<18} {:>12,.0f} rows/sec  {:>8.3f}s'.format(label, row_count / elapsed if elapsed else 0, elapsed)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import argparse
+import datetime
+import decimal
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_tableausdk
+stub_tableausdk.install()
+
+import tde
+
+
+METADATA = [
+    ('id', int, None, 10, 10, 0, False),
+    ('amount', decimal.Decimal, None, 18, 18, 4, True),
+    ('ratio', float, None, 53, 53, 0, True),
+    ('flag', bool, None, 1, 1, 0, True),
+    ('name', unicode, None, 50, 50, 0, True),
+    ('code', str, None, 10, 10, 0, True),
+    ('created', datetime.datetime, None, 23, 23, 3, True),
+]
+
+
+def make_rows(count):
+    created = datetime.datetime(2015, 8, 28, 17, 11, 0)
+    return [(i, decimal.Decimal(i) / 100, i * 0.5, i % 2 == 0, u'name {}'.format(i % 1000), 'C{}'.format(i % 10),
+             None if i % 50 == 0 else created) for i in xrange(count)]
+
+
+def measure(rows, reuse_row):
+    extract_path = os.path.join(tempfile.mkdtemp(), 'bench.tde')
+    with tde.TdeWriter(extract_path, reuse_row) as writer:
+        writer.set_metadata(METADATA)
+        start_time = time.time()
+        writer.write_rows(rows)
+        elapsed = time.time() - start_time
+    return elapsed, stub_tableausdk.extract_lib.calls
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='bench_row_reuse.py', description='Compares TdeWriter throughput with and without row buffer reuse against a stub extract library.')
+    parser.add_argument('--rows', type=int, default=200000, metavar='<rows>', help='The number of rows to write per run.')
+    args = vars(parser.parse_args(argv[1:]))
+
+    rows = make_rows(args['rows'])
+    for label, reuse_row in (('new row per insert', False), ('reused row', True)):
+        calls_before = stub_tableausdk.extract_lib.calls
+        elapsed, calls_after = measure(rows, reuse_row)
+        print '{:<20} {:>12,.0f} rows/sec  {:>10,} native calls'.format(label, len(rows) / elapsed, calls_after - calls_before)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
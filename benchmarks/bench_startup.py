@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TDE_SCRIPT = os.path.join(ROOT, 'tde.py')
+
+
+def get_cases(work_dir):
+    db_path = os.path.join(work_dir, 'source.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE bench (id INTEGER, name TEXT)')
+    conn.commit()
+    conn.close()
+    sql_path = os.path.join(work_dir, 'bench.sql')
+    with open(sql_path, 'w') as f:
+        f.write('SELECT * FROM bench')
+    dry_run = [TDE_SCRIPT, '--dry-run', '--tde', os.path.join(work_dir, 'bench.tde'), '--cn',
+               'module=sqlite3;database={}'.format(db_path), '--sql', sql_path]
+    return [
+        ('interpreter', ['-c', 'pass']),
+        ('import tde', ['-c', 'import tde']),
+        ('import tde + SDK', ['-c', 'import tde; tde.load_sdk()']),
+        ('import tde + all deps', ['-c', 'import tde, multiprocessing, convert; tde.load_sdk(); convert.get_numpy()']),
+        ('tde.py --help', [TDE_SCRIPT, '--help']),
+        ('tde.py --dry-run', dry_run),
+    ]
+
+
+def measure(args, repeat):
+    timings = list()
+    with open(os.devnull, 'w') as devnull:
+        for i in range(repeat):
+            start_time = time.time()
+            subprocess.check_call([sys.executable] + args, cwd=ROOT, stdout=devnull, stderr=devnull)
+            timings.append(time.time() - start_time)
+    timings.sort()
+    return timings[len(timings) // 2], timings[0]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='bench_startup.py', description='Measures the start-up time of tde.py: imports, --help and --dry-run, each in a fresh interpreter.')
+    parser.add_argument('--repeat', type=int, default=20, metavar='<count>', help='The runs per case. Default: 20')
+    args = vars(parser.parse_args(argv[1:]))
+
+    work_dir = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        sys.path.insert(0, ROOT)
+        import tde
+        print 'Tableau SDK importable: {}'.format(tde.load_sdk())
+        for label, case_args in get_cases(work_dir):
+            median, best = measure(case_args, args['repeat'])
+            print '{:<24} median {:>8.1f} ms  best {:>8.1f} ms'.format(label, median * 1000, best * 1000)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
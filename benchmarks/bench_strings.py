@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_tableausdk
+stub_tableausdk.install()
+
+import tde_strings
+from tableausdk.Extract import Row, TableDefinition
+
+# tde_strings binds the extract library on first use; the buffered setters call it directly.
+tde_strings.is_available()
+
+
+CARDINALITIES = (('unique', None), ('10k distinct', 10000), ('100 distinct', 100))
+
+
+def make_values(count, distinct, seed=0):
+    rnd = random.Random(seed)
+    if distinct is None:
+        return [u'customer name {:08d}'.format(i) for i in xrange(count)]
+    return [u'category {:05d}'.format(rnd.randint(0, distinct - 1)) for i in xrange(count)]
+
+
+def measure(values, set_string):
+    td = TableDefinition()
+    td.addColumn('name', stub_tableausdk.Type.UNICODE_STRING)
+    row = Row(td)
+    start_time = time.time()
+    for v in values:
+        set_string(row, 0, v)
+    return time.time() - start_time
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='bench_strings.py', description='Compares Row.setString with the buffered tde_strings path on a single string column, against a stub extract library.')
+    parser.add_argument('--values', type=int, default=1000000, metavar='<count>', help='The number of strings set per run. Default: 1000000')
+    parser.add_argument('--cache-size', type=int, default=256, metavar='<values>', help='The size of each generation of the converted-string cache. Default: 256')
+    args = vars(parser.parse_args(argv[1:]))
+
+    for label, distinct in CARDINALITIES:
+        values = make_values(args['values'], distinct)
+        baseline = measure(values, Row.setString)
+        buffered = measure(values, tde_strings.StringSetter(0).set)
+        cached = measure(values, tde_strings.StringSetter(args['cache_size']).set)
+        sampled_setter = tde_strings.StringSetter(sample_size=tde_strings.DEFAULT_CARDINALITY_SAMPLE)
+        sampled = measure(values, sampled_setter.set)
+        print '{:<14} setString {:>10,.0f}/sec  buffer {:>10,.0f}/sec ({:.2f}x)  buffer+cache {:>10,.0f}/sec ({:.2f}x)  sampled {:>10,.0f}/sec ({:.2f}x, hit rate {:.0%})'.format(
+            label, len(values) / baseline, len(values) / buffered, baseline / buffered, len(values) / cached, baseline / cached,
+            len(values) / sampled, baseline / sampled, sampled_setter.get_stats()['hit_rate'])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+PROFILES = {
+    'narrow': [('INTEGER', 1), ('REAL', 1), ('TEXT', 1), ('TIMESTAMP', 1)],
+    'wide': [('INTEGER', 20), ('REAL', 20), ('TEXT', 30), ('TIMESTAMP', 10)],
+    'strings': [('INTEGER', 1), ('TEXT', 15)],
+    'numeric': [('INTEGER', 8), ('REAL', 8)],
+    'datetime': [('INTEGER', 1), ('TIMESTAMP', 8)],
+}
+
+
+def get_columns(profile):
+    columns = list()
+    for sql_type, count in PROFILES[profile]:
+        for i in range(count):
+            columns.append(('{}_{}'.format(sql_type.lower(), i), sql_type))
+    return columns
+
+
+def make_value(rnd, sql_type, row_idx):
+    if rnd.random() < 0.02:
+        return None
+    if sql_type == 'INTEGER':
+        return rnd.randint(-2**31, 2**31 - 1)
+    elif sql_type == 'REAL':
+        return rnd.uniform(-1e6, 1e6)
+    elif sql_type == 'TEXT':
+        return u'value {}'.format(rnd.randint(0, 5000))
+    else:
+        return datetime.datetime(2015, 1, 1) + datetime.timedelta(seconds=rnd.randint(0, 86400 * 365))
+
+
+def create_source(db_path, profile, row_count, seed=0):
+    rnd = random.Random(seed)
+    columns = get_columns(profile)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('CREATE TABLE bench ({})'.format(', '.join('{} {}'.format(n, t) for n, t in columns)))
+        insert = 'INSERT INTO bench VALUES ({})'.format(', '.join('?' * len(columns)))
+        for start in xrange(0, row_count, 10000):
+            rows = [[make_value(rnd, t, i) for n, t in columns] for i in xrange(start, min(row_count, start + 10000))]
+            conn.executemany(insert, rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return 'module=sqlite3;database={};detect_types=1'.format(db_path)
+
+
+class NullTable(object):
+    def insert(self, row):
+        pass
+
+
+def measure_stages(tde, sql, connection_string, query, batch_size, work_dir):
+    helper = sql.get_helper(connection_string)
+    start_time = time.time()
+    batches = list(helper.execute_query_batches(query, batch_size))
+    fetch_time = time.time() - start_time
+    row_count = sum(len(b) for b in batches)
+
+    with tde.TdeWriter(os.path.join(work_dir, 'stages.tde')) as writer:
+        writer.set_metadata(helper.metadata)
+        table, writer.table = writer.table, NullTable()
+        start_time = time.time()
+        for rows in batches:
+            writer.write_rows(rows)
+        convert_time = time.time() - start_time
+
+        writer.table = table
+        row = writer.fill_tde_row(writer.row, batches[0][0]) if batches else None
+        start_time = time.time()
+        for i in xrange(row_count):
+            table.insert(row)
+        insert_time = time.time() - start_time
+
+    return {
+        'rows': row_count,
+        'fetch': {'seconds': fetch_time, 'rows_per_second': row_count / fetch_time if fetch_time else None},
+        'convert': {'seconds': convert_time, 'rows_per_second': row_count / convert_time if convert_time else None},
+        'insert': {'seconds': insert_time, 'rows_per_second': row_count / insert_time if insert_time else None},
+    }
+
+
+CASE_PARTS = ('end_to_end', 'stages')
+
+
+def get_peak_rss():
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def run_case(part, work_dir, batch_size, use_stub):
+    if use_stub:
+        import stub_tableausdk
+        stub_tableausdk.install()
+    import sql
+    import tde
+    tde.log.setLevel('WARNING')
+
+    connection_string = 'module=sqlite3;database={};detect_types=1'.format(os.path.join(work_dir, 'source.db'))
+    sql_path = os.path.join(work_dir, 'bench.sql')
+    if part == 'stages':
+        # Materializes the whole result, so it runs in an interpreter of its own and reports no RSS.
+        with open(sql_path, 'r') as f:
+            query = f.read()
+        return {'stages': measure_stages(tde, sql, connection_string, query, batch_size, work_dir)}
+    start_time = time.time()
+    generator = tde.TdeGenerator(connection_string, sql_path, os.path.join(work_dir, 'bench.tde'), batch_size)
+    generator.execute()
+    elapsed = time.time() - start_time
+    row_count = generator.stats.rows_written
+    return {
+        'end_to_end': {'seconds': elapsed, 'rows_per_second': row_count / elapsed if elapsed else None},
+        'peak_rss_bytes': get_peak_rss(),
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='bench_tde.py', description='Measures TdeGenerator throughput per stage against synthetic SQLite sources.')
+    parser.add_argument('--profiles', nargs='+', choices=sorted(PROFILES), default=sorted(PROFILES), help='The synthetic table shapes to benchmark.')
+    parser.add_argument('--rows', nargs='+', type=int, default=[100000], metavar='<rows>', help='The row counts to benchmark each profile at.')
+    parser.add_argument('--batch-size', type=int, default=10000, metavar='<rows>', help='The fetch batch size.')
+    parser.add_argument('--stub-sdk', action='store_true', help='Use the stub tableausdk even when the real SDK is importable.')
+    parser.add_argument('--output', default='bench_results.json', metavar='<json_file_path>', help='The file path to write the results to.')
+    parser.add_argument('--case', nargs=2, metavar=('<part>', '<work_dir>'), help=argparse.SUPPRESS)
+    args = vars(parser.parse_args(argv[1:]))
+
+    use_stub = args['stub_sdk']
+    if not use_stub:
+        try:
+            import tableausdk.Extract
+        except (ImportError, OSError):
+            use_stub = True
+
+    if args['case']:
+        print json.dumps(run_case(args['case'][0], args['case'][1], args['batch_size'], use_stub))
+        return
+
+    results = list()
+    for profile in args['profiles']:
+        for row_count in args['rows']:
+            work_dir = tempfile.mkdtemp(prefix='bench_tde_')
+            try:
+                create_source(os.path.join(work_dir, 'source.db'), profile, row_count)
+                with open(os.path.join(work_dir, 'bench.sql'), 'w') as f:
+                    f.write('SELECT * FROM bench')
+                result = {'profile': profile, 'columns': len(get_columns(profile)), 'batch_size': args['batch_size']}
+                # Each part runs in its own interpreter, so the peak RSS is the pipeline's alone: not the source
+                # creation, the stage pass holding the whole result, or earlier cases.
+                for part in CASE_PARTS:
+                    command = [sys.executable, os.path.abspath(__file__), '--case', part, work_dir,
+                               '--batch-size', str(args['batch_size'])] + (['--stub-sdk'] if use_stub else [])
+                    result.update(json.loads(subprocess.check_output(command).strip().splitlines()[-1]))
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            results.append(result)
+            print '{:<10} {:>10,} rows  fetch {:>12,.0f}/s  convert {:>10,.0f}/s  insert {:>12,.0f}/s  total {:>10,.0f}/s'.format(
+                profile, row_count, result['stages']['fetch']['rows_per_second'] or 0,
+                result['stages']['convert']['rows_per_second'] or 0, result['stages']['insert']['rows_per_second'] or 0,
+                result['end_to_end']['rows_per_second'] or 0)
+
+    report = {
+        'created': datetime.datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sdk': 'stub' if use_stub else 'tableausdk',
+        'results': results,
+    }
+    with open(args['output'], 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
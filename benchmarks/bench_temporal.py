@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_tableausdk
+stub_tableausdk.install()
+
+import temporal
+import tde
+
+
+# (label, distinct values): daily grain, hourly grain and unique microsecond timestamps over a year.
+CARDINALITIES = (('daily', 365), ('hourly', 365 * 24), ('unique', None))
+COLUMNS = 4
+
+
+def make_values(count, distinct, seed=0):
+    rnd = random.Random(seed)
+    start = datetime.datetime(2015, 1, 1)
+    if distinct is None:
+        return [start + datetime.timedelta(microseconds=rnd.randint(0, 86400 * 365 * 10 ** 6)) for i in xrange(count)]
+    step = 86400 * 365 // distinct
+    return [start + datetime.timedelta(seconds=rnd.randint(0, distinct - 1) * step) for i in xrange(count)]
+
+
+def unpack_without_fraction(values):
+    # The conversion tde.py used before the temporal layer: no sub-second part, nothing memoized.
+    return [None if v is None else (v.year, v.month, v.day, v.hour, v.minute, v.second, 0) for v in values], 0
+
+
+def measure_conversion(values, convert):
+    start_time = time.time()
+    convert(values)
+    return time.time() - start_time
+
+
+def measure_writer(rows):
+    metadata = [('created_{}'.format(i), datetime.datetime, None, 27, 27, 6, True) for i in range(COLUMNS)]
+    extract_path = os.path.join(tempfile.mkdtemp(), 'bench.tde')
+    with tde.TdeWriter(extract_path) as writer:
+        writer.set_metadata(metadata)
+        start_time = time.time()
+        writer.write_rows(rows)
+        elapsed = time.time() - start_time
+        stats = writer.get_stats()['temporal_cache']['created_0']
+    return elapsed, stats
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='bench_temporal.py', description='Compares datetime column conversion with and without memoized parts, and TdeWriter throughput on datetime-only rows, against a stub extract library.')
+    parser.add_argument('--values', type=int, default=500000, metavar='<count>', help='The number of datetime values per run. Default: 500000')
+    args = vars(parser.parse_args(argv[1:]))
+
+    for label, distinct in CARDINALITIES:
+        values = make_values(args['values'], distinct)
+        baseline = measure_conversion(values, unpack_without_fraction)
+        bulk = measure_conversion(values, temporal.to_datetime_parts)
+        memoized = measure_conversion(values, temporal.PartsConverter(temporal.get_datetime_parts, sample_size=len(values)).convert)
+        adaptive_converter = temporal.PartsConverter(temporal.get_datetime_parts, temporal.to_datetime_parts)
+        adaptive = sum(measure_conversion(values[i:i + 10000], adaptive_converter.convert) for i in xrange(0, len(values), 10000))
+        print '{:<8} unpack {:>10,.0f}/sec  bulk {:>10,.0f}/sec ({:.2f}x)  memoized {:>10,.0f}/sec ({:.2f}x)  adaptive {:>10,.0f}/sec ({:.2f}x, caching {})'.format(
+            label, len(values) / baseline, len(values) / bulk, baseline / bulk, len(values) / memoized, baseline / memoized,
+            len(values) / adaptive, baseline / adaptive, adaptive_converter.caching)
+
+        rows = zip(*[values[i:] + values[:i] for i in range(COLUMNS)])[:args['values'] // COLUMNS]
+        elapsed, stats = measure_writer(rows)
+        print '{:<8} TdeWriter {:>10,.0f} rows/sec ({} datetime columns, hit rate {:.0%})'.format(label, len(rows) / elapsed, COLUMNS, stats['hit_rate'])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# Stand-in for the tableausdk package so the writer can be benchmarked on machines without Tableau's native
+# libraries. The wrappers mirror the SDK's ctypes marshalling; the native calls themselves are no-ops.
+
+import sys
+import types
+from ctypes import byref, c_bool, c_char_p, c_double, c_int, c_longlong, c_void_p, c_wchar, c_wchar_p, \
+    create_string_buffer, sizeof
+
+
+class Type(object):
+    INTEGER = 7
+    DOUBLE = 10
+    BOOLEAN = 11
+    DATE = 12
+    DATETIME = 13
+    DURATION = 14
+    CHAR_STRING = 15
+    UNICODE_STRING = 16
+
+
+class Result(object):
+    SUCCESS = 0
+    INVALID_ARGUMENT = 1
+
+
+class TableauException(Exception):
+    def __init__(self, errorCode, message):
+        Exception.__init__(self, message)
+        self.errorCode = errorCode
+        self.message = message
+
+
+class StubLib(object):
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, name):
+        return self.call
+
+    def call(self, *args):
+        self.calls += 1
+        return Result.SUCCESS
+
+
+common_lib = StubLib()
+extract_lib = StubLib()
+
+
+def ToTableauString(value):
+    wstr = c_wchar_p(unicode(value))
+    buffer = create_string_buffer(sizeof(c_wchar) * (len(value) + 1))
+    common_lib.ToTableauString(wstr, byref(buffer))
+    return buffer
+
+
+class TableDefinition(object):
+    def __init__(self):
+        self._handle = c_void_p(None)
+        extract_lib.TabTableDefinitionCreate(byref(self._handle))
+        self.columns = list()
+
+    def close(self):
+        self._handle = None
+
+    def addColumn(self, name, type):
+        extract_lib.TabTableDefinitionAddColumn(self._handle, ToTableauString(name), c_int(type))
+        self.columns.append((name, type))
+
+    def getColumnCount(self):
+        return len(self.columns)
+
+    def getColumnName(self, columnNumber):
+        return self.columns[columnNumber][0]
+
+    def getColumnType(self, columnNumber):
+        retval = c_int()
+        extract_lib.TabTableDefinitionGetColumnType(self._handle, c_int(columnNumber), byref(retval))
+        return self.columns[columnNumber][1]
+
+
+class Row(object):
+    def __init__(self, tableDefinition):
+        self._handle = c_void_p(None)
+        ret = extract_lib.TabRowCreate(byref(self._handle), tableDefinition._handle)
+        if int(ret) != int(Result.SUCCESS):
+            raise TableauException(ret, 'TabRowCreate failed')
+
+    def close(self):
+        if self._handle is not None:
+            extract_lib.TabRowClose(self._handle)
+            self._handle = None
+
+    def __del__(self):
+        self.close()
+
+    def _check(self, result):
+        if result != Result.SUCCESS:
+            raise TableauException(result, 'Row setter failed')
+
+    def setNull(self, columnNumber):
+        self._check(extract_lib.TabRowSetNull(self._handle, c_int(columnNumber)))
+
+    def setInteger(self, columnNumber, value):
+        self._check(extract_lib.TabRowSetInteger(self._handle, c_int(columnNumber), c_int(value)))
+
+    def setLongInteger(self, columnNumber, value):
+        if value <= -2**63 or value >= 2**63:
+            raise TableauException(Result.INVALID_ARGUMENT, 'Value is out of range [-2^63+1, 2^63-1].')
+        self._check(extract_lib.TabRowSetLongInteger(self._handle, c_int(columnNumber), c_longlong(value)))
+
+    def setDouble(self, columnNumber, value):
+        self._check(extract_lib.TabRowSetDouble(self._handle, c_int(columnNumber), c_double(value)))
+
+    def setBoolean(self, columnNumber, value):
+        self._check(extract_lib.TabRowSetBoolean(self._handle, c_int(columnNumber), c_bool(value)))
+
+    def setString(self, columnNumber, value):
+        if value is None:
+            raise ValueError('value must not be None')
+        self._check(extract_lib.TabRowSetString(self._handle, c_int(columnNumber), ToTableauString(value)))
+
+    def setCharString(self, columnNumber, value):
+        if value is None:
+            raise ValueError('value must not be None')
+        self._check(extract_lib.TabRowSetCharString(self._handle, c_int(columnNumber), c_char_p(value)))
+
+    def setDate(self, columnNumber, year, month, day):
+        self._check(extract_lib.TabRowSetDate(self._handle, c_int(columnNumber), c_int(year), c_int(month),
+                                              c_int(day)))
+
+    def setDateTime(self, columnNumber, year, month, day, hour, min, sec, frac):
+        self._check(extract_lib.TabRowSetDateTime(self._handle, c_int(columnNumber), c_int(year), c_int(month),
+                                                  c_int(day), c_int(hour), c_int(min), c_int(sec), c_int(frac)))
+
+    def setDuration(self, columnNumber, day, hour, minute, second, frac):
+        self._check(extract_lib.TabRowSetDuration(self._handle, c_int(columnNumber), c_int(day), c_int(hour),
+                                                  c_int(minute), c_int(second), c_int(frac)))
+
+
+class Table(object):
+    def __init__(self, tableDefinition):
+        self._handle = c_void_p(None)
+        self.table_definition = tableDefinition
+        self.row_count = 0
+
+    def insert(self, row):
+        extract_lib.TabTableInsert(self._handle, row._handle)
+        self.row_count += 1
+
+    def getTableDefinition(self):
+        return self.table_definition
+
+
+class Extract(object):
+    def __init__(self, path):
+        self._handle = c_void_p(None)
+        extract_lib.TabExtractCreate(byref(self._handle), ToTableauString(path))
+        self.path = path
+        self.tables = dict()
+
+    def close(self):
+        self._handle = None
+
+    def addTable(self, name, tableDefinition):
+        self.tables[name] = Table(tableDefinition)
+        return self.tables[name]
+
+    def openTable(self, name):
+        return self.tables[name]
+
+    def hasTable(self, name):
+        return name in self.tables
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+def install():
+    package = types.ModuleType('tableausdk')
+    package.Type = Type
+    package.Result = Result
+    package.TableauException = TableauException
+
+    extract_module = types.ModuleType('tableausdk.Extract')
+    for cls in (TableDefinition, Row, Table, Extract):
+        setattr(extract_module, cls.__name__, cls)
+    extract_module.extract_lib = extract_lib
+
+    types_module = types.ModuleType('tableausdk.Types')
+    types_module.Type = Type
+    types_module.Result = Result
+
+    string_utils_module = types.ModuleType('tableausdk.StringUtils')
+    string_utils_module.ToTableauString = ToTableauString
+    string_utils_module.common_lib = common_lib
+
+    package.Extract = extract_module
+    package.Types = types_module
+    package.StringUtils = string_utils_module
+    sys.modules['tableausdk'] = package
+    sys.modules['tableausdk.Extract'] = extract_module
+    sys.modules['tableausdk.Types'] = types_module
+    sys.modules['tableausdk.StringUtils'] = string_utils_module
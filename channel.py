@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+import cPickle
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+
+DEFAULT_CHANNEL_CAPACITY = 8
+
+
+class ChannelClosed(Exception):
+    pass
+
+
+class BatchChannel(object):
+    def __init__(self, capacity=DEFAULT_CHANNEL_CAPACITY):
+        if capacity < 1:
+            raise ValueError('Channel capacity must be at least 1.')
+        self.capacity = capacity
+        self.closed = False
+        self.put_count = 0
+        self.get_count = 0
+        self.high_water_mark = 0
+        self.put_wait_time = 0.0
+        self.get_wait_time = 0.0
+        self.__items = deque()
+        self.__lock = threading.Lock()
+        self.__not_empty = threading.Condition(self.__lock)
+        self.__not_full = threading.Condition(self.__lock)
+
+    def put(self, item):
+        with self.__not_full:
+            if len(self.__items) >= self.capacity and not self.closed:
+                start_time = time.time()
+                while len(self.__items) >= self.capacity and not self.closed:
+                    self.__not_full.wait()
+                self.put_wait_time += time.time() - start_time
+            if self.closed:
+                raise ChannelClosed('Cannot put to a closed channel.')
+            self.__items.append(item)
+            self.put_count += 1
+            self.high_water_mark = max(self.high_water_mark, len(self.__items))
+            self.__not_empty.notify()
+
+    def get(self):
+        with self.__not_empty:
+            if not self.__items and not self.closed:
+                start_time = time.time()
+                while not self.__items and not self.closed:
+                    self.__not_empty.wait()
+                self.get_wait_time += time.time() - start_time
+            if not self.__items:
+                raise ChannelClosed('Cannot get from a closed, empty channel.')
+            item = self.__items.popleft()
+            self.get_count += 1
+            self.__not_full.notify()
+            return item
+
+    def close(self):
+        with self.__lock:
+            self.closed = True
+            self.__not_empty.notify_all()
+            self.__not_full.notify_all()
+
+    def qsize(self):
+        with self.__lock:
+            return len(self.__items)
+
+    def get_stats(self):
+        with self.__lock:
+            return {
+                'capacity': self.capacity,
+                'depth': len(self.__items),
+                'high_water_mark': self.high_water_mark,
+                'puts': self.put_count,
+                'gets': self.get_count,
+                'put_wait_time': self.put_wait_time,
+                'get_wait_time': self.get_wait_time,
+            }
+
+
+DEFAULT_SPILL_SEGMENT_BYTES = 256 * 1024 * 1024
+
+
+def get_row_count(item):
+    if isinstance(item, list) and item[0] == 'rows':
+        return len(item[1])
+    return 0
+
+
+class SpillingChannel(object):
+    def __init__(self, memory_rows, spill_dir=None, segment_bytes=DEFAULT_SPILL_SEGMENT_BYTES):
+        if memory_rows < 1:
+            raise ValueError('Channel memory budget must be at least 1 row.')
+        self.memory_rows = memory_rows
+        self.spill_dir = spill_dir
+        self.segment_bytes = segment_bytes
+        self.closed = False
+        self.put_count = 0
+        self.get_count = 0
+        self.high_water_mark = 0
+        self.put_wait_time = 0.0
+        self.get_wait_time = 0.0
+        self.spilled_batches = 0
+        self.spilled_rows = 0
+        self.spilled_bytes = 0
+        self.__items = deque()
+        self.__rows_in_memory = 0
+        self.__segments = dict()
+        self.__write_segment = None
+        self.__read_segment = None
+        self.__lock = threading.Lock()
+        self.__not_empty = threading.Condition(self.__lock)
+        # Serializes spilling producers, so spilled batches are queued in the order they are written to the segments.
+        self.__spill_lock = threading.Lock()
+
+    def put(self, item):
+        row_count = get_row_count(item)
+        with self.__lock:
+            if self.closed:
+                raise ChannelClosed('Cannot put to a closed channel.')
+            spill = row_count and self.__rows_in_memory + row_count > self.memory_rows
+            if not spill:
+                self.__items.append((False, item, row_count))
+                self.__rows_in_memory += row_count
+        if spill:
+            # Serialized outside the lock so the writer keeps draining memory meanwhile.
+            data = zlib.compress(cPickle.dumps([item[0], [tuple(r) for r in item[1]]] + item[2:], cPickle.HIGHEST_PROTOCOL), 1)
+            with self.__spill_lock:
+                if self.closed:
+                    raise ChannelClosed('Cannot put to a closed channel.')
+                segment = self.__spill(data)
+                with self.__lock:
+                    self.__items.append((True, segment, row_count))
+                    self.spilled_batches += 1
+                    self.spilled_rows += row_count
+                    self.spilled_bytes += len(data)
+        with self.__lock:
+            self.put_count += 1
+            self.high_water_mark = max(self.high_water_mark, len(self.__items))
+            self.__not_empty.notify()
+
+    def get(self):
+        with self.__not_empty:
+            if not self.__items and not self.closed:
+                start_time = time.time()
+                while not self.__items and not self.closed:
+                    self.__not_empty.wait()
+                self.get_wait_time += time.time() - start_time
+            if not self.__items:
+                raise ChannelClosed('Cannot get from a closed, empty channel.')
+            spilled, item, row_count = self.__items.popleft()
+            if not spilled:
+                self.__rows_in_memory -= row_count
+            self.get_count += 1
+        if spilled:
+            item = self.__replay(item)
+        return item
+
+    def close(self):
+        # Waits for a batch being spilled, so its segment is not closed under it.
+        with self.__spill_lock:
+            with self.__lock:
+                self.closed = True
+                self.__not_empty.notify_all()
+                segments, self.__segments = self.__segments.values(), dict()
+        for segment in segments:
+            segment.close(delete=True)
+
+    def qsize(self):
+        with self.__lock:
+            return len(self.__items)
+
+    def get_stats(self):
+        with self.__lock:
+            return {
+                'memory_rows': self.memory_rows,
+                'depth': len(self.__items),
+                'high_water_mark': self.high_water_mark,
+                'puts': self.put_count,
+                'gets': self.get_count,
+                'put_wait_time': self.put_wait_time,
+                'get_wait_time': self.get_wait_time,
+                'spilled_batches': self.spilled_batches,
+                'spilled_rows': self.spilled_rows,
+                'spilled_bytes': self.spilled_bytes,
+            }
+
+    def __spill(self, data):
+        # Called with the spill lock held.
+        segment = self.__write_segment
+        if segment is None or segment.size >= self.segment_bytes:
+            segment = SpillSegment(self.spill_dir)
+            with self.__lock:
+                self.__segments[segment.path] = segment
+            self.__write_segment = segment
+        segment.write(data)
+        return segment.path
+
+    def __replay(self, segment_path):
+        with self.__lock:
+            segment = self.__segments.get(segment_path)
+        if segment is None:
+            raise ChannelClosed('Spill segment was discarded when the channel closed.')
+        if self.__read_segment is not segment:
+            # Segments are consumed in order, so the previous one is fully replayed and can be removed.
+            if self.__read_segment is not None:
+                with self.__lock:
+                    self.__segments.pop(self.__read_segment.path, None)
+                self.__read_segment.close(delete=True)
+            self.__read_segment = segment
+        return cPickle.loads(zlib.decompress(segment.read()))
+
+
+class SpillSegment(object):
+    def __init__(self, spill_dir=None):
+        import tempfile
+        fd, self.path = tempfile.mkstemp(prefix='tde_spill_', suffix='.seg', dir=spill_dir)
+        self.__writer = os.fdopen(fd, 'wb')
+        self.__reader = open(self.path, 'rb')
+        self.size = 0
+
+    def write(self, data):
+        self.__writer.write(struct.pack('<I', len(data)))
+        self.__writer.write(data)
+        self.__writer.flush()
+        self.size += len(data) + 4
+
+    def read(self):
+        length = struct.unpack('<I', self.__reader.read(4))[0]
+        return self.__reader.read(length)
+
+    def close(self, delete=False):
+        for f in (self.__writer, self.__reader):
+            if not f.closed:
+                f.close()
+        if delete and os.path.exists(self.path):
+            os.remove(self.path)
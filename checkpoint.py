@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+from incremental import HighWaterMark
+from os import path, remove
+
+
+RESUME_FILTER = 'resume_filter'
+DEFAULT_CHECKPOINT_INTERVAL = 1000000
+
+
+class Checkpoint(HighWaterMark):
+    # The last key committed to the extract for a query ordered by a unique key. Resuming reads only the rows after it,
+    # so the SQL script must contain a ${resume_filter} placeholder and an ORDER BY on the key.
+    placeholder = RESUME_FILTER
+    purpose = 'resumable extracts'
+
+    def __init__(self, checkpoint_file_path, column_name):
+        self.rows = 0
+        HighWaterMark.__init__(self, checkpoint_file_path, column_name)
+
+    def load(self):
+        state = HighWaterMark.load(self)
+        if state is not None:
+            self.rows = state.get('rows', 0)
+        return state
+
+    def get_state(self):
+        state = HighWaterMark.get_state(self)
+        state['rows'] = self.rows
+        return state
+
+    def exists(self):
+        return path.exists(self.state_file_path)
+
+    def reset(self):
+        self.value = None
+        self.rows = 0
+
+    def clear(self):
+        self.reset()
+        if path.exists(self.state_file_path):
+            remove(self.state_file_path)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+# numpy takes a noticeable share of startup time, so it is imported with the first converted batch.
+_numpy = None
+_numpy_loaded = False
+
+
+def get_numpy():
+    global _numpy, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy as _numpy
+        except ImportError:
+            _numpy = None
+        _numpy_loaded = True
+    return _numpy
+
+
+def transpose(rows):
+    return zip(*rows)
+
+
+def get_null_positions(values):
+    numpy = get_numpy()
+    if numpy is not None:
+        return numpy.flatnonzero(numpy.equal(numpy.array(values, dtype=object), None)).tolist()
+    return [i for i, v in enumerate(values) if v is None]
+
+
+def restore_nulls(converted, null_positions):
+    for i in null_positions:
+        converted[i] = None
+    return converted
+
+
+def convert_values(values, convert):
+    # Slow path for columns holding a value the bulk conversion rejects: converts cell by cell and
+    # leaves failures as NULL. Returns the converted values and the number of values coerced to NULL.
+    converted = list()
+    errors = 0
+    for v in values:
+        if v is None:
+            converted.append(None)
+            continue
+        try:
+            converted.append(convert(v))
+        except Exception:
+            converted.append(None)
+            errors += 1
+    return converted, errors
+
+
+def convert_column(values, convert_bulk, convert_value):
+    try:
+        return convert_bulk(values)
+    except Exception:
+        return convert_values(values, convert_value)
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+import convert
+import csv
+import datetime
+import os
+import re
+import time
+from cStringIO import StringIO
+from itertools import izip_longest
+
+
+DEFAULT_SAMPLE_ROWS = 1000
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+DATE_CACHE_SIZE = 65536
+UTF8_BOM = '\xef\xbb\xbf'
+BOOLEAN_VALUES = {'true': True, 'false': False}
+# ISO dates and timestamps, also without zero padding (2012-7-3 11:40:12.455) as in the SDK's orders.csv sample.
+TEMPORAL_PATTERN = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})(?:[ T](\d{1,2}):(\d{1,2})(?::(\d{1,2})(?:\.(\d{1,6}))?)?)?$')
+
+
+def parse_int(value):
+    return int(value) if value else None
+
+
+def parse_float(value):
+    return float(value) if value else None
+
+
+def parse_bool(value):
+    return BOOLEAN_VALUES[value.lower()] if value else None
+
+
+def parse_temporal(value):
+    # Zero-padded values are sliced at fixed positions; anything else goes through the pattern.
+    if len(value) == 10 and value[4] == '-' and value[7] == '-':
+        return datetime.date(int(value[:4]), int(value[5:7]), int(value[8:10]))
+    if len(value) >= 19 and value[4] == '-' and value[7] == '-' and value[10] in ' T' and value[13] == ':' and value[16] == ':':
+        fraction = value[20:] if len(value) > 20 and value[19] == '.' else ''
+        if len(value) == 19 or (fraction.isdigit() and len(fraction) <= 6):
+            return datetime.datetime(int(value[:4]), int(value[5:7]), int(value[8:10]), int(value[11:13]),
+                                     int(value[14:16]), int(value[17:19]), int(fraction.ljust(6, '0')) if fraction else 0)
+    match = TEMPORAL_PATTERN.match(value)
+    if match is None:
+        raise ValueError('"{}" is not a date or timestamp.'.format(value))
+    parts = match.groups()
+    if parts[3] is None:
+        return datetime.date(int(parts[0]), int(parts[1]), int(parts[2]))
+    return datetime.datetime(int(parts[0]), int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4]),
+                             int(parts[5] or 0), int((parts[6] or '0').ljust(6, '0')))
+
+
+class TemporalParser(object):
+    # Extracts usually repeat the same dates many times, so parsed values are cached by their text.
+    def __init__(self, source_type, cache_size=DATE_CACHE_SIZE):
+        self.source_type = source_type
+        self.cache_size = cache_size
+        self.cache = dict()
+
+    def __call__(self, value):
+        if not value:
+            return None
+        parsed = self.cache.get(value)
+        if parsed is None:
+            parsed = parse_temporal(value)
+            if self.source_type is datetime.datetime and type(parsed) is datetime.date:
+                parsed = datetime.datetime(parsed.year, parsed.month, parsed.day)
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            self.cache[value] = parsed
+        return parsed
+
+
+def is_int(value):
+    digits = value[1:] if value[:1] in '+-' else value
+    return digits.isdigit() and (len(digits) == 1 or digits[0] != '0')
+
+
+def is_float(value):
+    # Digits with leading zeros are kept as text, e.g. zip codes and account numbers.
+    if value.isdigit() and not is_int(value):
+        return False
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return any(c.isdigit() for c in value)
+
+
+def is_temporal(value):
+    try:
+        parse_temporal(value)
+    except ValueError:
+        return False
+    return True
+
+
+def infer_type(values):
+    values = [v for v in values if v]
+    if not values:
+        return unicode
+    if all(v.lower() in BOOLEAN_VALUES for v in values):
+        return bool
+    if all(is_int(v) for v in values):
+        return int
+    if all(is_float(v) for v in values):
+        return float
+    if all(is_temporal(v) for v in values):
+        return datetime.datetime if any(len(v) > 10 for v in values) else datetime.date
+    return unicode
+
+
+class CsvSource(object):
+    def __init__(self, csv_file_path, delimiter=',', quotechar='"', encoding='utf-8', header=True,
+                 sample_rows=DEFAULT_SAMPLE_ROWS, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        self.csv_file_path = csv_file_path
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.encoding = encoding
+        self.header = header
+        self.sample_rows = sample_rows
+        self.workers = workers
+        self.chunk_bytes = chunk_bytes
+        self.data_offset = 0
+        self.multiline = False
+
+    def get_reader(self, lines):
+        return csv.reader(lines, delimiter=self.delimiter, quotechar=self.quotechar)
+
+    def infer_metadata(self):
+        # Reads the header and the sample, and notes where the data starts for get_chunks().
+        with open(self.csv_file_path, 'rb') as f:
+            names = None
+            if self.header:
+                line = f.readline()
+                if line.startswith(UTF8_BOM):
+                    line = line[len(UTF8_BOM):]
+                names = [n.decode(self.encoding).strip() for n in next(self.get_reader([line]), [])]
+            elif f.read(len(UTF8_BOM)) != UTF8_BOM:
+                f.seek(0)
+            self.data_offset = f.tell()
+            lines = list()
+            while len(lines) < self.sample_rows:
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line)
+        sample = [r for r in self.get_reader(lines) if r]
+        # A quoted field holding a line break cannot be split at line boundaries.
+        self.multiline = len(sample) < len([l for l in lines if l.strip()])
+        column_count = max([len(names or [])] + [len(r) for r in sample])
+        names = (names or list()) + ['F{}'.format(i + 1) for i in range(len(names or []), column_count)]
+        columns = list(izip_longest(*sample, fillvalue='')) or [()] * column_count
+        return [(name, infer_type(values), None, None, None, None, True) for name, values in zip(names, columns)]
+
+    def get_chunks(self, count):
+        # Splits the data into byte ranges that start at a line boundary.
+        size = os.path.getsize(self.csv_file_path)
+        if self.multiline or size <= self.data_offset:
+            return [(self.data_offset, size)]
+        count = max(count, -(-(size - self.data_offset) // self.chunk_bytes))
+        bounds = [self.data_offset]
+        with open(self.csv_file_path, 'rb') as f:
+            for idx in range(1, count):
+                f.seek(self.data_offset + (size - self.data_offset) * idx // count)
+                f.readline()
+                offset = min(f.tell(), size)
+                if offset > bounds[-1]:
+                    bounds.append(offset)
+        bounds.append(size)
+        return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+    def get_parsers(self, metadata):
+        encoding = self.encoding
+        parsers = {
+            int: parse_int,
+            float: parse_float,
+            bool: parse_bool,
+        }
+        result = list()
+        for c in metadata:
+            if c[1] in (datetime.date, datetime.datetime):
+                result.append(TemporalParser(c[1]))
+            else:
+                result.append(parsers.get(c[1], lambda value: value.decode(encoding, 'replace')))
+        return result
+
+    def read_batches(self, metadata, start, end, batch_size, parse_errors=None):
+        parsers = self.get_parsers(metadata)
+        with open(self.csv_file_path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        records = list()
+        for record in self.get_reader(StringIO(data)):
+            if record:
+                records.append(record)
+                if len(records) >= batch_size:
+                    yield self.parse_records(records, parsers, metadata, parse_errors)
+                    records = list()
+        if records:
+            yield self.parse_records(records, parsers, metadata, parse_errors)
+
+    @staticmethod
+    def parse_records(records, parsers, metadata, parse_errors=None):
+        columns = list()
+        for parse, c, values in zip(parsers, metadata, izip_longest(*records, fillvalue='')):
+            parsed, errors = parse_column(values, parse)
+            columns.append(parsed)
+            if errors and parse_errors is not None:
+                parse_errors[c[0]] = parse_errors.get(c[0], 0) + errors
+        return zip(*columns)
+
+
+def parse_column(values, parse):
+    try:
+        return map(parse, values), 0
+    except Exception:
+        return convert.convert_values(values, parse)
+
+
+def read_chunks(source, metadata, batch_size, chunk_queue, output_queue, worker):
+    # Worker process: parses the chunks it takes from chunk_queue until it gets None.
+    rows_read = 0
+    parse_time = 0.0
+    parse_errors = dict()
+    error = None
+    try:
+        for start, end in iter(chunk_queue.get, None):
+            start_time = time.time()
+            for rows in source.read_batches(metadata, start, end, batch_size, parse_errors):
+                parse_time += time.time() - start_time
+                output_queue.put(['rows', rows])
+                rows_read += len(rows)
+                start_time = time.time()
+            parse_time += time.time() - start_time
+    except Exception as ex:
+        error = ex.message or str(ex)
+    finally:
+        output_queue.put(['done', worker, rows_read, parse_time, error, parse_errors])
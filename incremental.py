@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import decimal
+import json
+import sql
+from os import path, remove, rename
+from string import Template
+
+
+INCREMENTAL_FILTER = 'incremental_filter'
+
+
+def encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {'type': 'datetime', 'value': value.isoformat()}
+    elif isinstance(value, datetime.date):
+        return {'type': 'date', 'value': value.isoformat()}
+    elif isinstance(value, decimal.Decimal):
+        return {'type': 'decimal', 'value': str(value)}
+    return {'type': type(value).__name__, 'value': value}
+
+
+def decode_value(data):
+    value = data['value']
+    if data['type'] == 'datetime':
+        return datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f' if '.' in value else '%Y-%m-%dT%H:%M:%S')
+    elif data['type'] == 'date':
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    elif data['type'] == 'decimal':
+        return decimal.Decimal(value)
+    return value
+
+
+def write_json_file(file_path, data):
+    # Written to a temporary file first so a crash never leaves a truncated state file behind.
+    temp_path = '{}.tmp'.format(file_path)
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    if path.exists(file_path):
+        remove(file_path)
+    rename(temp_path, file_path)
+
+
+class HighWaterMark(object):
+    placeholder = INCREMENTAL_FILTER
+    purpose = 'incremental loads'
+
+    def __init__(self, state_file_path, column_name):
+        self.state_file_path = state_file_path
+        self.column_name = column_name
+        self.value = None
+        self.column_index = None
+        self.load()
+
+    def load(self):
+        if not path.exists(self.state_file_path):
+            return
+        with open(self.state_file_path, 'r') as f:
+            state = json.load(f)
+        if state.get('column', '').lower() != self.column_name.lower():
+            raise ValueError('State file "{}" tracks column "{}", not "{}".'.format(self.state_file_path, state.get('column'), self.column_name))
+        if state.get('high_water_mark') is not None:
+            self.value = decode_value(state['high_water_mark'])
+        return state
+
+    def get_state(self):
+        return {
+            'column': self.column_name,
+            'high_water_mark': encode_value(self.value) if self.value is not None else None,
+        }
+
+    def save(self):
+        write_json_file(self.state_file_path, self.get_state())
+
+    def get_filter(self):
+        if self.value is None:
+            return '1 = 1'
+        return '{} > {}'.format(self.column_name, sql.to_sql_literal(self.value))
+
+    def apply(self, query):
+        if '${}'.format(self.placeholder) not in query and '${{{}}}'.format(self.placeholder) not in query:
+            raise ValueError('The SQL script must contain a ${{{}}} placeholder for {}.'.format(self.placeholder, self.purpose))
+        return Template(query).safe_substitute({self.placeholder: self.get_filter()})
+
+    def set_metadata(self, metadata):
+        names = [c[0].lower() for c in metadata]
+        if self.column_name.lower() not in names:
+            raise ValueError('High-water-mark column "{}" is not in the query results.'.format(self.column_name))
+        self.column_index = names.index(self.column_name.lower())
+
+    def observe(self, rows):
+        idx = self.column_index
+        values = [r[idx] for r in rows if r[idx] is not None]
+        if values:
+            batch_max = max(values)
+            if self.value is None or batch_max > self.value:
+                self.value = batch_max
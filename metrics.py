@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+
+class PipelineStats(object):
+    def __init__(self):
+        self.start_time = time.time()
+        self.end_time = None
+        self.fetch_time = 0.0
+        self.batches_read = 0
+        self.rows_read = 0
+        self.rows_written = 0
+        self.throughput = list()
+        self.queue_stats = dict()
+        self.sink_stats = dict()
+        self.__last_sample = (self.start_time, 0)
+
+    def timed_fetch(self, batches):
+        batches = iter(batches)
+        while True:
+            start_time = time.time()
+            try:
+                rows = next(batches)
+            finally:
+                self.fetch_time += time.time() - start_time
+            self.batches_read += 1
+            self.rows_read += len(rows)
+            yield rows
+
+    def sample(self):
+        now = time.time()
+        rows_written = self.rows_written
+        last_time, last_rows = self.__last_sample
+        interval = now - last_time
+        sample = {
+            'elapsed_time': now - self.start_time,
+            'rows_read': self.rows_read,
+            'rows_written': rows_written,
+            'rows_per_second': (rows_written - last_rows) / interval if interval else 0.0,
+        }
+        self.__last_sample = (now, rows_written)
+        self.throughput.append(sample)
+        return sample
+
+    def finish(self):
+        self.end_time = time.time()
+
+    def get_summary(self):
+        elapsed = (self.end_time or time.time()) - self.start_time
+        return {
+            'elapsed_time': elapsed,
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'rows_per_second': self.rows_written / elapsed if elapsed else 0.0,
+            'fetch_time': self.fetch_time,
+            'batches_read': self.batches_read,
+            'reader_queue_wait_time': self.queue_stats.get('put_wait_time', 0.0),
+            'writer_queue_wait_time': self.queue_stats.get('get_wait_time', 0.0),
+            'queue': self.queue_stats,
+            'sink': self.sink_stats,
+            'throughput': self.throughput,
+        }
+
+
+class ProgressReporter(threading.Thread):
+    def __init__(self, stats, interval, report):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.stats = stats
+        self.interval = interval
+        self.report = report
+        self.__stopped = threading.Event()
+
+    def run(self):
+        while not self.__stopped.wait(self.interval):
+            self.report(self.stats.sample())
+
+    def stop(self):
+        self.__stopped.set()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import decimal
+import hashlib
+import json
+import sql
+from incremental import write_json_file
+from os import path
+
+
+SOURCE_TYPES = dict((t.__name__, t) for t in (unicode, str, datetime.datetime, datetime.date, datetime.time, datetime.timedelta,
+                                              bool, int, long, decimal.Decimal, float, bytearray, buffer))
+SECRET_CONNECTION_PARTS = ('pwd', 'password')
+
+
+def get_schema_key(query, connection_string):
+    parts = sql.parse_connection_string(connection_string)
+    connection = ';'.join('{}={}'.format(k, v) for k, v in sorted(parts.items()) if k.lower() not in SECRET_CONNECTION_PARTS)
+    return hashlib.sha1(u'{}\0{}'.format(connection, query).encode('utf-8')).hexdigest()
+
+
+def encode_metadata(metadata):
+    return [{'name': c[0], 'source_type': getattr(c[1], '__name__', None), 'description': list(c[2:])} for c in metadata]
+
+
+def decode_metadata(columns):
+    return [(c['name'], SOURCE_TYPES.get(c['source_type'])) + tuple(c['description']) for c in columns]
+
+
+def get_signature(metadata):
+    return [(c[0], getattr(c[1], '__name__', None)) for c in metadata]
+
+
+class SchemaCache(object):
+    def __init__(self, cache_file_path, query, connection_string):
+        self.cache_file_path = cache_file_path
+        self.key = get_schema_key(query, connection_string)
+
+    def load(self):
+        if not path.exists(self.cache_file_path):
+            return None
+        with open(self.cache_file_path, 'r') as f:
+            cache = json.load(f)
+        if cache.get('key') != self.key:
+            return None
+        return decode_metadata(cache['columns'])
+
+    def save(self, metadata):
+        write_json_file(self.cache_file_path, {
+            'key': self.key,
+            'columns': encode_metadata(metadata),
+        })
+
+    def check(self, cached_metadata, metadata):
+        if cached_metadata is not None and get_signature(cached_metadata) == get_signature(metadata):
+            return True
+        self.save(metadata)
+        return False
+
+    @staticmethod
+    def describe_drift(cached_metadata, metadata):
+        cached = dict(get_signature(cached_metadata))
+        current = dict(get_signature(metadata))
+        changes = list()
+        for name in sorted(set(cached) | set(current)):
+            if name not in current:
+                changes.append('{} removed'.format(name))
+            elif name not in cached:
+                changes.append('{} added ({})'.format(name, current[name]))
+            elif cached[name] != current[name]:
+                changes.append('{} changed from {} to {}'.format(name, cached[name], current[name]))
+        return ', '.join(changes) or 'column order changed'
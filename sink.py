@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+
+DEFAULT_TABLE_NAME = 'Extract'
+
+
+class ExtractSink(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def prepare_metadata(self, metadata):
+        pass
+
+    def set_metadata(self, metadata, table_name=DEFAULT_TABLE_NAME):
+        raise NotImplementedError()
+
+    def write_rows(self, rows, table_name=DEFAULT_TABLE_NAME):
+        raise NotImplementedError()
+
+    def flush(self, committed=None):
+        if committed is not None:
+            committed()
+
+    def close(self):
+        pass
+
+    def get_stats(self):
+        return dict()
+
+
+class NullSink(ExtractSink):
+    def __init__(self):
+        self.metadata = None
+        self.row_count = 0
+
+    def set_metadata(self, metadata, table_name=DEFAULT_TABLE_NAME):
+        self.metadata = metadata
+
+    def write_rows(self, rows, table_name=DEFAULT_TABLE_NAME):
+        self.row_count += len(rows)
+
+
+class RecordingSink(ExtractSink):
+    def __init__(self, keep_rows=True):
+        self.keep_rows = keep_rows
+        self.metadata = None
+        self.rows = list()
+        self.row_count = 0
+        self.batch_timings = list()
+        self.start_time = None
+        self.end_time = None
+
+    def set_metadata(self, metadata, table_name=DEFAULT_TABLE_NAME):
+        self.metadata = metadata
+        if self.start_time is None:
+            self.start_time = time.time()
+
+    def write_rows(self, rows, table_name=DEFAULT_TABLE_NAME):
+        start_time = time.time()
+        if self.keep_rows:
+            self.rows.extend(tuple(r) for r in rows)
+        self.row_count += len(rows)
+        self.batch_timings.append((start_time, len(rows), time.time() - start_time))
+
+    def close(self):
+        self.end_time = time.time()
+
+    def get_summary(self):
+        elapsed = (self.end_time or time.time()) - self.start_time if self.start_time else 0.0
+        return {
+            'columns': len(self.metadata) if self.metadata else 0,
+            'rows': self.row_count,
+            'batches': len(self.batch_timings),
+            'write_time': sum(t[2] for t in self.batch_timings),
+            'elapsed_time': elapsed,
+            'rows_per_second': self.row_count / elapsed if elapsed else 0.0,
+        }
+
+    def get_stats(self):
+        return self.get_summary()
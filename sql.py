@@ -1,66 +1,310 @@
 # -*- coding: utf-8 -*-
 
-import pyodbc
+import datetime
+import decimal
+import importlib
+import os
+import threading
+import time
+from contextlib import closing, contextmanager
 
 
-class SqlHelper:
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_POOL_SIZE = 4
+DEFAULT_POOL_IDLE_TIMEOUT = 300
+POOL_OPTIONS = ('pool_size', 'pool_idle_timeout')
+# Options that only change how queries run on a connection; they are not passed to connect() and do not split pools.
+CURSOR_OPTIONS = ('arraysize', 'query_timeout')
+TUNING_OPTIONS = CURSOR_OPTIONS + ('packet_size', 'readonly')
+SQL_ATTR_PACKET_SIZE = 112
+
+
+class ConnectionPool(object):
+    def __init__(self, connect, max_size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.__connect = connect
+        self.__idle = list()
+        self.__size = 0
+        self.__lock = threading.Condition()
+
+    def checkout(self):
+        while True:
+            conn = None
+            with self.__lock:
+                while True:
+                    self.__close_expired()
+                    if self.__idle:
+                        conn = self.__idle.pop()[0]
+                        break
+                    if self.__size < self.max_size:
+                        self.__size += 1
+                        break
+                    self.__lock.wait()
+            if conn is None:
+                try:
+                    return self.__connect()
+                except:
+                    self.__release()
+                    raise
+            if self.is_healthy(conn):
+                return conn
+            self.checkin(conn, discard=True)
+
+    def checkin(self, conn, discard=False):
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            self.__close_connection(conn)
+            self.__release()
+            return
+        with self.__lock:
+            self.__idle.append((conn, time.time()))
+            self.__lock.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.checkout()
+        healthy = False
+        try:
+            yield conn
+            healthy = True
+        except GeneratorExit:
+            healthy = True
+            raise
+        finally:
+            self.checkin(conn, discard=not healthy)
+
+    def close(self):
+        with self.__lock:
+            idle, self.__idle = self.__idle, list()
+            self.__size -= len(idle)
+            self.__lock.notify_all()
+        for conn, returned_at in idle:
+            self.__close_connection(conn)
+
+    @staticmethod
+    def is_healthy(conn):
+        try:
+            with closing(conn.cursor()) as c:
+                c.execute('SELECT 1')
+                c.fetchall()
+            return True
+        except Exception:
+            return False
+
+    def __close_expired(self):
+        expire_before = time.time() - self.idle_timeout
+        expired = [i for i in self.__idle if i[1] < expire_before]
+        if expired:
+            self.__idle = [i for i in self.__idle if i[1] >= expire_before]
+            self.__size -= len(expired)
+            for conn, returned_at in expired:
+                self.__close_connection(conn)
+
+    def __release(self):
+        with self.__lock:
+            self.__size -= 1
+            self.__lock.notify()
+
+    @staticmethod
+    def __close_connection(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pools = dict()
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(key, connect, max_size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT):
+    global _pools, _pools_pid
+    with _pools_lock:
+        # Connections inherited by a forked worker process belong to the parent, so the child starts its own pools.
+        if _pools_pid != os.getpid():
+            _pools = dict()
+            _pools_pid = os.getpid()
+        if key not in _pools:
+            _pools[key] = ConnectionPool(connect, max_size, idle_timeout)
+        return _pools[key]
+
+
+def close_pools():
+    with _pools_lock:
+        pools = _pools.values()
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+class DbApiHelper(object):
     def __init__(self, connection_string):
-        self.__provider__ = None
-        self.__server__ = None
-        self.__database__ = None
-        self.__user__ = None
-        self.__password__ = None
-        self.__trusted__ = None
-        self.__port__ = None
-        self.__sslmode__ = None
+        self.__dbapi__ = None
+        self.__connect_args__ = dict()
         self.metadata = None
         self.__connection_string = connection_string
+        self.arraysize = None
+        self.packet_size = None
+        self.readonly = False
+        self.query_timeout = 0
+        self.__load_tuning_options__(connection_string)
         self.__load_connection_string__(connection_string)
+        self.__load_pool_options__(connection_string)
 
     def execute_query(self, query_string):
-        query = query_string
-        row_count = 0
+        for rows in self.execute_query_batches(query_string):
+            for row in rows:
+                yield row
+
+    def execute_query_batches(self, query_string, batch_size=DEFAULT_BATCH_SIZE, metadata_callback=None):
         try:
-            with self.__get_connection_object__() as conn:
-                conn.timeout = 0
-                with conn.cursor() as c:
-                    c.execute(query)
+            with self.__connection__() as conn:
+                self.__prepare_connection__(conn)
+                with closing(conn.cursor()) as c:
+                    # fetchmany() is called without a size, so a configured arraysize is the fetch size; pyodbc itself
+                    # does not prefetch by arraysize, it only sets how many rows each call returns.
+                    c.arraysize = self.arraysize or batch_size
+                    c.execute(query_string)
                     self.metadata = c.description
-                    for row in c:
-                        yield row
-                        row_count += 1
-        except pyodbc.Error as ex:
+                    # Column types are normally known as soon as the query executes; drivers that report no types
+                    # get them inferred from the first batch instead.
+                    is_resolved = self.metadata is None or all(d[1] is not None for d in self.metadata)
+                    if is_resolved and self.metadata is not None and metadata_callback is not None:
+                        metadata_callback(self.metadata)
+                    while True:
+                        rows = c.fetchmany()
+                        if not rows:
+                            break
+                        if not is_resolved:
+                            self.metadata = self.infer_metadata(c.description, rows)
+                            is_resolved = True
+                            if metadata_callback is not None:
+                                metadata_callback(self.metadata)
+                        yield rows
+                    if not is_resolved and metadata_callback is not None:
+                        metadata_callback(self.metadata)
+        except self.__dbapi__.Error as ex:
             raise Exception(str(ex.args[-1]))
         except:
             raise
 
+    def check_connection(self):
+        try:
+            with self.__connection__():
+                pass
+        except self.__dbapi__.Error as ex:
+            raise Exception(str(ex.args[-1]))
+
     def execute_non_query(self, query_string):
         rowcount = 0
         try:
-            with self.__get_connection_object__() as conn:
-                with conn.cursor() as c:
-                    rowcount = c.execute(query_string).rowcount
-        except pyodbc.Error as ex:
-            conn.rollback()
-            raise pyodbc.Error(ex.args[-1])
+            with self.__connection__() as conn:
+                try:
+                    with closing(conn.cursor()) as c:
+                        c.execute(query_string)
+                        rowcount = c.rowcount
+                except self.__dbapi__.Error as ex:
+                    conn.rollback()
+                    raise self.__dbapi__.Error(ex.args[-1])
+                else:
+                    conn.commit()
         except:
             raise
-        else:
-            conn.commit()
         return rowcount
 
+    def __connection__(self):
+        if self.__pool__ is None:
+            return closing(self.__get_connection_object__())
+        return self.__pool__.connection()
+
     def __get_connection_object__(self):
+        try:
+            return self.__dbapi__.connect(**self.__connect_args__)
+        except:
+            raise
+
+    def __prepare_connection__(self, conn):
+        pass
+
+    def __load_connection_string__(self, connection_string):
+        parts = parse_connection_string(connection_string)
+        if 'module' not in parts:
+            raise ValueError('Invalid connection string value: A DB-API module must be specified')
+        self.__dbapi__ = importlib.import_module(parts.pop('module'))
+        self.__connect_args__ = dict((k, int(v) if v.isdigit() else v) for k, v in parts.items()
+                                     if k not in POOL_OPTIONS and k not in TUNING_OPTIONS)
+
+    def __load_tuning_options__(self, connection_string):
+        parts = parse_connection_string(connection_string)
+        if 'arraysize' in parts: self.arraysize = int(parts['arraysize'])
+        if 'packet_size' in parts: self.packet_size = int(parts['packet_size'])
+        if 'readonly' in parts: self.readonly = parse_bool(parts['readonly'])
+        if 'query_timeout' in parts: self.query_timeout = int(parts['query_timeout'])
+
+    def __load_pool_options__(self, connection_string):
+        parts = parse_connection_string(connection_string)
+        pool_size = int(parts.get('pool_size', DEFAULT_POOL_SIZE))
+        idle_timeout = float(parts.get('pool_idle_timeout', DEFAULT_POOL_IDLE_TIMEOUT))
+        self.__pool__ = None
+        if pool_size > 0:
+            key = tuple(sorted((k, v) for k, v in parts.items() if k not in POOL_OPTIONS and k not in CURSOR_OPTIONS))
+            self.__pool__ = get_pool(key, self.__get_connection_object__, pool_size, idle_timeout)
+
+    @staticmethod
+    def infer_metadata(description, rows):
+        # Drivers such as sqlite3 leave type_code empty, so the column type is taken from the first non-NULL value.
+        if description is None or all(d[1] is not None for d in description):
+            return description
+        metadata = list()
+        for idx, d in enumerate(description):
+            d = tuple(d)
+            if d[1] is None:
+                value = next((r[idx] for r in rows if r[idx] is not None), None)
+                d = (d[0], type(value) if value is not None else None) + d[2:]
+            metadata.append(d)
+        return metadata
+
+
+class SqlHelper(DbApiHelper):
+    def __init__(self, connection_string):
+        self.__provider__ = None
+        self.__server__ = None
+        self.__database__ = None
+        self.__user__ = None
+        self.__password__ = None
+        self.__trusted__ = None
+        self.__port__ = None
+        self.__sslmode__ = None
+        DbApiHelper.__init__(self, connection_string)
+
+    def __get_connection_object__(self):
+        options = dict()
+        if self.readonly:
+            options['readonly'] = True
+        if self.packet_size:
+            options['attrs_before'] = {SQL_ATTR_PACKET_SIZE: self.packet_size}
         try:
             if self.__trusted__:
-                return pyodbc.connect(server=self.__server__, driver=self.__provider__, database=self.__database__,
-                                      trusted_connection=self.__trusted__, port=self.__port__, sslmode=self.__sslmode__)
+                return self.__dbapi__.connect(server=self.__server__, driver=self.__provider__, database=self.__database__,
+                                              trusted_connection=self.__trusted__, port=self.__port__, sslmode=self.__sslmode__, **options)
             else:
-                return pyodbc.connect(server=self.__server__, driver=self.__provider__, database=self.__database__,
-                                      uid=self.__user__, pwd=self.__password__, port=self.__port__, sslmode=self.__sslmode__)
+                return self.__dbapi__.connect(server=self.__server__, driver=self.__provider__, database=self.__database__,
+                                              uid=self.__user__, pwd=self.__password__, port=self.__port__, sslmode=self.__sslmode__, **options)
         except:
             raise
 
+    def __prepare_connection__(self, conn):
+        conn.timeout = self.query_timeout
+
     def __load_connection_string__(self, connection_string):
+        import pyodbc
+        self.__dbapi__ = pyodbc
         parts = parse_connection_string(connection_string)
 
         if 'server' in parts: self.__server__ = parts['server']
@@ -80,6 +324,12 @@ class SqlHelper:
                 self.__trusted__ = False
 
 
+def get_helper(connection_string):
+    if 'module' in parse_connection_string(connection_string):
+        return DbApiHelper(connection_string)
+    return SqlHelper(connection_string)
+
+
 def build_connection_string(provider, server, database, user=None, password=None, port=None, sslmode=None, trusted_connection=None):
     cn_string = 'provider={};server={};database={}'.format(provider, server, database)
     if user is not None:
@@ -95,6 +345,17 @@ def build_connection_string(provider, server, database, user=None, password=None
     return cn_string
 
 
+def add_connection_options(connection_string, **options):
+    for key, value in sorted(options.items()):
+        if value is not None:
+            connection_string = '{};{}={}'.format(connection_string, key, value)
+    return connection_string
+
+
+def parse_bool(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
 def parse_connection_string(connection_string):
     parts = {}
     cn_parts = connection_string.split(';')
@@ -102,3 +363,22 @@ def parse_connection_string(connection_string):
         p = cn_part.split('=')
         parts[p[0]] = p[1]
     return parts
+
+
+def to_sql_literal(value):
+    if value is None:
+        return 'NULL'
+    elif isinstance(value, bool):
+        return '1' if value else '0'
+    elif isinstance(value, float):
+        return repr(value)
+    elif isinstance(value, (int, long, decimal.Decimal)):
+        return str(value)
+    elif isinstance(value, datetime.datetime):
+        # DATETIME columns only accept millisecond literals; keep full precision only when it is needed.
+        fraction = '{:06d}'.format(value.microsecond) if value.microsecond % 1000 else '{:03d}'.format(value.microsecond // 1000)
+        return "'{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}.{}'".format(value.year, value.month, value.day, value.hour,
+                                                                      value.minute, value.second, fraction)
+    elif isinstance(value, datetime.date):
+        return "'{:04d}-{:02d}-{:02d}'".format(value.year, value.month, value.day)
+    return u"'{}'".format(unicode(value).replace(u"'", u"''"))
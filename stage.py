@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+import cPickle
+import decimal
+import datetime
+import json
+import mmap
+import os
+import sink
+import struct
+import time
+import zlib
+from schema_cache import decode_metadata, encode_metadata
+
+
+STAGE_FORMATS = ('arrow', 'builtin')
+BUILTIN_MAGIC = 'TDESTAGE1\n'
+ARROW_MAGIC = 'ARROW1'
+HEADER = struct.Struct('<II')
+METADATA_KEY = 'tde_metadata'
+
+# pyarrow is optional and slow to import, so it is only imported when a stage file is written or read.
+_pyarrow = None
+_pyarrow_loaded = False
+
+
+def get_pyarrow():
+    global _pyarrow, _pyarrow_loaded
+    if not _pyarrow_loaded:
+        try:
+            import pyarrow as _pyarrow
+        except ImportError:
+            _pyarrow = None
+        _pyarrow_loaded = True
+    return _pyarrow
+
+
+def get_default_format():
+    return 'arrow' if get_pyarrow() is not None else 'builtin'
+
+
+def get_arrow_type(pa, source_type):
+    arrow_types = {
+        unicode: pa.string(),
+        str: pa.binary(),
+        bytearray: pa.binary(),
+        buffer: pa.binary(),
+        bool: pa.bool_(),
+        int: pa.int64(),
+        long: pa.int64(),
+        float: pa.float64(),
+        datetime.datetime: pa.timestamp('us'),
+        datetime.date: pa.date32(),
+        datetime.time: pa.time64('us'),
+        datetime.timedelta: pa.duration('us'),
+    }
+    # Decimals are staged as text so no precision is lost; they are parsed back when read.
+    return arrow_types.get(source_type, pa.string())
+
+
+def to_arrow_values(values, source_type):
+    if source_type in (unicode, bool, int, long, float, str, datetime.datetime, datetime.date, datetime.time, datetime.timedelta):
+        return values
+    if source_type in (bytearray, buffer):
+        return [None if v is None else bytes(v) for v in values]
+    return [None if v is None else unicode(v) for v in values]
+
+
+def from_arrow_values(values, source_type):
+    if source_type is decimal.Decimal:
+        return [None if v is None else decimal.Decimal(v) for v in values]
+    return values
+
+
+class StageSink(sink.ExtractSink):
+    def __init__(self, stage_path, stage_format=None):
+        self.stage_path = stage_path
+        self.stage_format = stage_format or get_default_format()
+        if self.stage_format not in STAGE_FORMATS:
+            raise ValueError('Unknown stage format "{}".'.format(self.stage_format))
+        if self.stage_format == 'arrow' and get_pyarrow() is None:
+            raise ImportError('The pyarrow package is required for the "arrow" stage format.')
+        self.metadata = None
+        self.batches = 0
+        self.row_count = 0
+        self.write_time = 0.0
+        # Written next to the target and renamed over it on close, so a failed run never leaves a truncated stage file.
+        self.temp_path = '{}.tmp'.format(stage_path)
+        self.aborted = False
+        self.file = open(self.temp_path, 'wb')
+        self.writer = None
+        self.schema = None
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.abort()
+        self.close()
+
+    def abort(self):
+        self.aborted = True
+
+    def set_metadata(self, metadata, table_name=sink.DEFAULT_TABLE_NAME):
+        if table_name != sink.DEFAULT_TABLE_NAME:
+            raise ValueError('A stage file holds a single table.')
+        self.metadata = metadata
+        encoded = json.dumps(encode_metadata(metadata))
+        if self.stage_format == 'arrow':
+            pa = get_pyarrow()
+            fields = [pa.field(c[0], get_arrow_type(pa, c[1])) for c in metadata]
+            self.schema = pa.schema(fields, metadata={METADATA_KEY: encoded})
+            self.writer = pa.ipc.new_file(self.file, self.schema)
+        else:
+            self.file.write(BUILTIN_MAGIC)
+            self.file.write(struct.pack('<I', len(encoded)))
+            self.file.write(encoded)
+
+    def write_rows(self, rows, table_name=sink.DEFAULT_TABLE_NAME):
+        if not rows:
+            return
+        start_time = time.time()
+        columns = zip(*rows)
+        if self.stage_format == 'arrow':
+            pa = get_pyarrow()
+            arrays = [pa.array(to_arrow_values(list(values), c[1]), type=field.type)
+                      for values, c, field in zip(columns, self.metadata, self.schema)]
+            self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        else:
+            payload = zlib.compress(cPickle.dumps(columns, cPickle.HIGHEST_PROTOCOL), 1)
+            self.file.write(HEADER.pack(len(rows), len(payload)))
+            self.file.write(payload)
+        self.batches += 1
+        self.row_count += len(rows)
+        self.write_time += time.time() - start_time
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if not self.file.closed:
+            self.file.close()
+        if not os.path.exists(self.temp_path):
+            return
+        if self.aborted:
+            os.remove(self.temp_path)
+            return
+        if os.path.exists(self.stage_path):
+            os.remove(self.stage_path)
+        os.rename(self.temp_path, self.stage_path)
+
+    def get_stats(self):
+        return {
+            'stage_format': self.stage_format,
+            'batches': self.batches,
+            'rows': self.row_count,
+            'write_time': self.write_time,
+        }
+
+
+class StageReader(object):
+    def __init__(self, stage_path):
+        self.stage_path = stage_path
+        self.file = open(stage_path, 'rb')
+        magic = self.file.read(len(BUILTIN_MAGIC))
+        if magic == BUILTIN_MAGIC:
+            self.stage_format = 'builtin'
+        elif magic.startswith(ARROW_MAGIC):
+            self.stage_format = 'arrow'
+        else:
+            self.file.close()
+            raise ValueError('"{}" is not a stage file.'.format(stage_path))
+        self.metadata = None
+        self.map = None
+        self.reader = None
+        self.data_offset = None
+        if self.stage_format == 'arrow':
+            pa = get_pyarrow()
+            if pa is None:
+                raise ImportError('The pyarrow package is required to read "{}".'.format(stage_path))
+            self.map = pa.memory_map(stage_path, 'r')
+            self.reader = pa.ipc.open_file(self.map)
+            self.metadata = decode_metadata(json.loads(self.reader.schema.metadata[METADATA_KEY]))
+        else:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            offset = len(BUILTIN_MAGIC)
+            length = struct.unpack_from('<I', self.map, offset)[0]
+            offset += 4
+            self.metadata = decode_metadata(json.loads(self.map[offset:offset + length]))
+            self.data_offset = offset + length
+
+    def read_batches(self):
+        if self.stage_format == 'arrow':
+            for idx in xrange(self.reader.num_record_batches):
+                batch = self.reader.get_batch(idx)
+                columns = [from_arrow_values(batch.column(i).to_pylist(), c[1]) for i, c in enumerate(self.metadata)]
+                yield zip(*columns)
+        else:
+            offset = self.data_offset
+            size = len(self.map)
+            while offset < size:
+                row_count, length = HEADER.unpack_from(self.map, offset)
+                offset += HEADER.size
+                # Decompressed straight from the mapped pages, without copying the payload first.
+                columns = cPickle.loads(zlib.decompress(buffer(self.map, offset, length)))
+                offset += length
+                yield zip(*columns)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,37 +1,130 @@
 import sql
+import sink
+import channel
+import metrics
+import incremental
+import convert
+import schema_cache
+import stage
+import checkpoint
+import tde_strings
+import temporal
+import csv_source
 import codecs
+import json
 import datetime
 import decimal
 import argparse
 import logging
+import shutil
 import sys
 import time
-from multiprocessing import Queue
-from os import path, remove as del_file
-from threading import Thread
-from tableausdk import Type
-from tableausdk.Extract import Extract, TableDefinition, Table, Row
+from Queue import Empty
+from os import path, remove as del_file, rename
+from threading import Lock, Thread
 
+# The Tableau SDK loads its native libraries on import, so it is imported by load_sdk() only once an extract is written.
+# Without it the pipeline can still run against the sinks in sink.py.
+Type = Extract = TableDefinition = Table = Row = None
+_sdk_lock = Lock()
 
-logging.basicConfig(level=logging.CRITICAL, format='%(asctime)s|%(name)s|%(levelname)s|%(message)s')
+LOG_FORMAT = '%(asctime)s|%(name)s|%(levelname)s|%(message)s'
 log = logging.getLogger(path.basename(__file__))
 log.setLevel(logging.DEBUG)
+log.addHandler(logging.NullHandler())
+
+
+def configure_logging():
+    logging.basicConfig(level=logging.CRITICAL, format=LOG_FORMAT)
+
+
+def _set_date(row, idx, data):
+    row.setDate(idx, data.year, data.month, data.day)
+
+
+def _set_datetime(row, idx, data):
+    row.setDateTime(idx, *temporal.get_datetime_parts(data))
+
+
+def _set_duration(row, idx, data):
+    row.setDuration(idx, *temporal.get_duration_parts(data))
+
+
+def _set_long_integer(row, idx, data):
+    row.setLongInteger(idx, int(data))
+
+
+# SQL INT columns report a precision of 10 digits and always fit Row.setInteger; wider integer columns use setLongInteger.
+MAX_INTEGER_PRECISION = 10
+# Scale-0 decimals up to 18 digits fit a 64-bit integer exactly, instead of being rounded to a double.
+MAX_LONG_INTEGER_PRECISION = 18
+
+
+TDE_VALUE_SETTERS = dict()
+# Temporal columns are converted a column of each batch at a time; these setters take the prepared values.
+TDE_PREPARED_SETTERS = dict()
+# Temporal columns get their own memoizing converter (see temporal.py) from these part functions and bulk converters.
+TDE_TEMPORAL_PARTS = dict()
+
+
+def load_sdk():
+    global Type, Extract, TableDefinition, Table, Row
+    with _sdk_lock:
+        if Extract is not None:
+            return True
+        try:
+            from tableausdk import Type
+            from tableausdk.Extract import Extract, TableDefinition, Table, Row
+        except ImportError:
+            return False
+        TDE_VALUE_SETTERS.update({
+            Type.DOUBLE: Row.setDouble,
+            Type.BOOLEAN: Row.setBoolean,
+            Type.CHAR_STRING: Row.setCharString,
+            Type.DATE: _set_date,
+            Type.DATETIME: _set_datetime,
+            Type.DURATION: _set_duration,
+            Type.INTEGER: Row.setInteger,
+            Type.UNICODE_STRING: Row.setString,
+        })
+        TDE_PREPARED_SETTERS.update(TDE_VALUE_SETTERS)
+        TDE_PREPARED_SETTERS.update({
+            Type.DATE: lambda row, idx, parts: row.setDate(idx, *parts),
+            Type.DATETIME: lambda row, idx, parts: row.setDateTime(idx, *parts),
+            Type.DURATION: lambda row, idx, parts: row.setDuration(idx, *parts),
+        })
+        TDE_TEMPORAL_PARTS.update({
+            Type.DATE: (temporal.get_date_parts, None),
+            Type.DATETIME: (temporal.get_datetime_parts, temporal.to_datetime_parts),
+            Type.DURATION: (temporal.get_duration_parts, None),
+        })
+        return True
 
 
 class TdeColumn(object):
-    def __init__(self, column_name, source_type):
+    def __init__(self, column_name, source_type, precision=None, scale=None, strict=False):
         self.column_name = column_name
         self.source_type = source_type
-        self.tde_type = self.get_tde_type(source_type)
+        self.precision = precision
+        self.scale = scale
+        self.strict = strict
+        self.tde_type = self.get_tde_type(source_type, precision, scale)
+        self.null_coercions = 0
+        self.string_setter = None
+        self.parts_converter = None
 
     @staticmethod
-    def get_tde_type(py_type):
+    def get_tde_type(py_type, precision=None, scale=None):
         if py_type is unicode:
             return Type.UNICODE_STRING
         elif py_type is str:
             return Type.CHAR_STRING
         elif py_type is datetime.datetime:
             return Type.DATETIME
+        elif py_type is datetime.date:
+            return Type.DATE
+        elif py_type is datetime.time or py_type is datetime.timedelta:
+            return Type.DURATION
         elif py_type is bool:
             return Type.BOOLEAN
         elif py_type is int:
@@ -39,69 +132,278 @@ class TdeColumn(object):
         elif py_type is long:
             return Type.INTEGER
         elif py_type is decimal.Decimal:
+            if scale == 0 and precision is not None and precision <= MAX_LONG_INTEGER_PRECISION:
+                return Type.INTEGER
             return Type.DOUBLE
         elif py_type is float:
             return Type.DOUBLE
         else:
             return Type.UNICODE_STRING
 
+    def is_long_integer(self):
+        if self.source_type is int:
+            return self.precision is None or self.precision > MAX_INTEGER_PRECISION
+        return self.source_type is not bool
+
+    def prepare(self, values):
+        # Only temporal columns gain from bulk conversion: the setters of the other types take the values as they are,
+        # and converting them first is slower than calling the setter (see benchmarks/bench_columnar.py).
+        if self.parts_converter is None:
+            return values
+        prepared, errors = convert.convert_column(values, self.parts_converter.convert, self.parts_converter.convert_value)
+        if errors and self.strict:
+            raise ValueError('{} values of column "{}" could not be converted to TDE type {}.'.format(errors, self.column_name, self.tde_type))
+        self.null_coercions += errors
+        return prepared
+
+    def get_setter(self, idx, prepared=False):
+        # Resolved once per table, so the per-cell path only calls the chosen setter.
+        set_value = (TDE_PREPARED_SETTERS if prepared else TDE_VALUE_SETTERS).get(self.tde_type)
+        if self.tde_type == Type.INTEGER and self.is_long_integer():
+            set_value = Row.setLongInteger if self.source_type in (int, long) else _set_long_integer
+        if self.string_setter is not None:
+            set_value = self.string_setter.set
+        if set_value is None:
+            return lambda row, data: row.setNull(idx)
+
+        def set_column(row, data):
+            if data is None:
+                row.setNull(idx)
+                return
+            try:
+                set_value(row, idx, data)
+            except Exception as ex:
+                if self.strict:
+                    raise ValueError('Column "{}": {!r} cannot be written as TDE type {}: {}'.format(self.column_name, data, self.tde_type, ex.message or str(ex)))
+                self.null_coercions += 1
+                row.setNull(idx)
+        return set_column
+
+
+class TdeWriter(sink.ExtractSink):
+    # Per-table attributes; with several tables they are swapped in by use_table() before each batch.
+    TABLE_STATE = ('table', 'table_definition', 'tde_columns', 'column_setters', 'prepared_setters', 'row')
 
-class TdeWriter(object):
-    def __init__(self, extract_path):
+    def __init__(self, extract_path, reuse_row=True, append=False, columnar=True, fast_strings=True,
+                 string_cache_sample=tde_strings.DEFAULT_CARDINALITY_SAMPLE, strict=False):
+        if not load_sdk():
+            raise ImportError('The tableausdk package is required to write TDE files.')
         try:
+            # The extract as it was before the run is kept until the run succeeds, so a failed run never leaves
+            # a partly written extract behind.
+            self.backup_path = '{}.bak'.format(extract_path)
+            self.aborted = False
+            if path.exists(self.backup_path):
+                del_file(self.backup_path)
             if path.exists(extract_path):
-                #import os.remove as del_file
-                del_file(extract_path)
+                if append:
+                    shutil.copyfile(extract_path, self.backup_path)
+                else:
+                    rename(extract_path, self.backup_path)
+            self.extract_path = extract_path
             self.extract = Extract(extract_path)
+            self.table_name = sink.DEFAULT_TABLE_NAME
+            self.table_states = dict()
             self.table_definition = TableDefinition()
             self.table = None
             self.tde_columns = list()
+            self.column_setters = list()
+            self.prepared_setters = list()
+            self.prepared = None
+            self.prepared_definition = None
+            self.columnar = columnar
+            self.fast_strings = fast_strings and tde_strings.is_available()
+            self.string_cache_sample = string_cache_sample
+            self.strict = strict
+            self.reuse_row = reuse_row
+            self.row = None
+            self.convert_time = 0.0
+            self.insert_time = 0.0
         except Exception as ex:
             log.exception(ex.message)
 
-    def __enter__(self):
-        return self
-
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.abort()
+        self.close()
+
+    def abort(self):
+        self.aborted = True
+
+    def close(self):
         try:
+            for state in self.get_table_states():
+                if state['row'] is not None:
+                    state['row'].close()
             self.extract.close()
         except Exception as ex:
             pass
+        if path.exists('{}.tmp'.format(self.backup_path)):
+            del_file('{}.tmp'.format(self.backup_path))
+        if self.aborted:
+            if path.exists(self.extract_path):
+                del_file(self.extract_path)
+            if path.exists(self.backup_path):
+                rename(self.backup_path, self.extract_path)
+        elif path.exists(self.backup_path):
+            del_file(self.backup_path)
+
+    def flush(self, committed=None):
+        # The Extract API only commits rows when the extract is closed, so it is closed and reopened for appending.
+        # The committed extract replaces the copy a failed run is restored from, but only once committed() has
+        # recorded what it holds, e.g. in a checkpoint.
+        table_name = self.table_name
+        for state in self.get_table_states():
+            if state['row'] is not None:
+                state['row'].close()
+        self.extract.close()
+        temp_path = '{}.tmp'.format(self.backup_path)
+        shutil.copyfile(self.extract_path, temp_path)
+        if committed is not None:
+            committed()
+        if path.exists(self.backup_path):
+            del_file(self.backup_path)
+        rename(temp_path, self.backup_path)
+        self.extract = Extract(self.extract_path)
+        for name in [table_name] + self.table_states.keys():
+            self.use_table(name)
+            self.table = self.extract.openTable(name)
+            self.table_definition = self.table.getTableDefinition()
+            if self.reuse_row:
+                self.row = Row(self.table_definition)
+        self.use_table(table_name)
+
+    def use_table(self, table_name):
+        if table_name == self.table_name:
+            return
+        self.table_states[self.table_name] = dict((a, getattr(self, a)) for a in self.TABLE_STATE)
+        state = self.table_states.pop(table_name, None) or dict((a, None) for a in self.TABLE_STATE)
+        for a in self.TABLE_STATE:
+            setattr(self, a, state[a])
+        self.table_name = table_name
+
+    def get_table_states(self):
+        current = dict((a, getattr(self, a)) for a in self.TABLE_STATE)
+        return [current] + self.table_states.values()
 
     def write_row(self, row_data):
-        tr = self.get_tde_row(self.table_definition, row_data)
-        self.table.insert(tr)
-        tr.close()
+        if self.reuse_row:
+            self.table.insert(self.fill_tde_row(self.row, row_data))
+        else:
+            tr = self.get_tde_row(row_data)
+            self.table.insert(tr)
+            tr.close()
 
-    def set_metadata(self, metadata):
-        self.tde_columns = [TdeColumn(c[0], c[1]) for c in metadata]
-        self.table_definition = self.get_table_definition(self.tde_columns)
-        self.table = self.extract.addTable('Extract', self.table_definition)
+    def write_rows(self, rows, table_name=sink.DEFAULT_TABLE_NAME):
+        self.use_table(table_name)
+        timer = time.time
+        setters = self.column_setters
+        convert_time = 0.0
+        insert_time = 0.0
+        if self.columnar and self.prepared_setters and rows:
+            start_time = timer()
+            rows = self.prepare_rows(rows)
+            setters = self.prepared_setters
+            convert_time += timer() - start_time
+        for row_data in rows:
+            start_time = timer()
+            tr = self.fill_tde_row(self.row if self.reuse_row else Row(self.table_definition), row_data, setters)
+            converted_time = timer()
+            self.table.insert(tr)
+            if not self.reuse_row:
+                tr.close()
+            insert_time += timer() - converted_time
+            convert_time += converted_time - start_time
+        self.convert_time += convert_time
+        self.insert_time += insert_time
 
-    @staticmethod
-    def get_tde_row(table_definition, row_data):
-        row = Row(table_definition)
-        for idx, data in enumerate(row_data):
-            t = table_definition.getColumnType(idx)
-            try:
-                if t is Type.DOUBLE:
-                    row.setDouble(idx, data)
-                elif t is Type.BOOLEAN:
-                    row.setBoolean(idx, data)
-                elif t is Type.CHAR_STRING:
-                    row.setCharString(idx, data)
-                elif t is Type.DATE:
-                    row.setDate(idx, data.year, data.month, data.day)
-                elif t is Type.DATETIME:
-                    row.setDateTime(idx, data.year, data.month, data.day, data.hour, data.minute, data.second, 0)
-                elif t is Type.INTEGER:
-                    row.setInteger(idx, data)
-                elif t is Type.UNICODE_STRING:
-                    row.setString(idx, data)
-            except Exception as ex:
-                row.setNull(idx)
+    def get_stats(self):
+        # Columns of tables other than the default one are reported as <table>.<column>.
+        tables = [(self.table_name, self.tde_columns)] + [(n, state['tde_columns']) for n, state in self.table_states.items()]
+        columns = list()
+        for name, tde_columns in sorted(tables):
+            prefix = '' if name == sink.DEFAULT_TABLE_NAME else '{}.'.format(name)
+            columns.extend(('{}{}'.format(prefix, c.column_name), c) for c in tde_columns or list())
+        return {
+            'convert_time': self.convert_time,
+            'insert_time': self.insert_time,
+            'null_coercions': dict((n, c.null_coercions) for n, c in columns if c.null_coercions),
+            'string_cache': dict((n, c.string_setter.get_stats()) for n, c in columns if c.string_setter is not None),
+            'temporal_cache': dict((n, c.parts_converter.get_stats()) for n, c in columns if c.parts_converter is not None),
+        }
+
+    def prepare_metadata(self, metadata):
+        self.prepared = self.get_tde_columns(metadata)
+        self.prepared_definition = self.get_table_definition(self.prepared)
+
+    def set_metadata(self, metadata, table_name=sink.DEFAULT_TABLE_NAME):
+        self.use_table(table_name)
+        self.tde_columns = self.get_tde_columns(metadata)
+        if self.extract.hasTable(table_name):
+            self.table = self.extract.openTable(table_name)
+            self.table_definition = self.table.getTableDefinition()
+            self.match_table_definition(self.tde_columns, self.table_definition)
+            log.debug('TDE Extract appending to the existing table "{}".'.format(table_name))
+        elif self.prepared is not None and self.get_signature(self.prepared) == self.get_signature(self.tde_columns):
+            self.table_definition = self.prepared_definition
+            self.table = self.extract.addTable(table_name, self.table_definition)
+        else:
+            self.table_definition = self.get_table_definition(self.tde_columns)
+            self.table = self.extract.addTable(table_name, self.table_definition)
+        if self.fast_strings:
+            for c in self.tde_columns:
+                if c.tde_type == Type.UNICODE_STRING:
+                    c.string_setter = tde_strings.StringSetter(sample_size=self.string_cache_sample)
+        for c in self.tde_columns:
+            if c.tde_type in TDE_TEMPORAL_PARTS:
+                c.parts_converter = temporal.PartsConverter(*TDE_TEMPORAL_PARTS[c.tde_type])
+        self.column_setters = self.get_column_setters(self.tde_columns)
+        self.prepared_setters = None
+        if any(c.parts_converter is not None for c in self.tde_columns):
+            self.prepared_setters = self.get_column_setters(self.tde_columns, prepared=True)
+        if self.reuse_row:
+            self.row = Row(self.table_definition)
+
+    def get_tde_row(self, row_data):
+        return self.fill_tde_row(Row(self.table_definition), row_data)
+
+    def fill_tde_row(self, row, row_data, setters=None):
+        setters = setters or self.column_setters
+        for set_column, data in zip(setters, row_data):
+            set_column(row, data)
+        # A reused row still holds the previous record, so columns missing from a short record are nulled explicitly.
+        for idx in range(len(row_data), len(setters)):
+            row.setNull(idx)
         return row
 
+    def prepare_rows(self, rows):
+        columns = convert.transpose(rows)
+        return zip(*[c.prepare(values) for c, values in zip(self.tde_columns, columns)])
+
+    def get_tde_columns(self, metadata):
+        # Precision and scale come from cursor.description: (name, type_code, display_size, internal_size, precision, scale, null_ok).
+        return [TdeColumn(c[0], c[1], c[4] if len(c) > 5 else None, c[5] if len(c) > 5 else None, self.strict) for c in metadata]
+
+    @staticmethod
+    def get_signature(tde_columns):
+        return [(c.column_name, c.tde_type) for c in tde_columns]
+
+    @staticmethod
+    def match_table_definition(tde_columns, table_definition):
+        column_count = table_definition.getColumnCount()
+        if column_count != len(tde_columns):
+            raise Exception('The query returns {} columns but the existing extract table has {}.'.format(len(tde_columns), column_count))
+        # Values must be written with the types the table was created with.
+        for idx, c in enumerate(tde_columns):
+            tde_type = table_definition.getColumnType(idx)
+            if tde_type != c.tde_type:
+                log.warning('Column "{}" is written as TDE type {} to match the existing extract table.'.format(c.column_name, tde_type))
+                c.tde_type = tde_type
+
+    @staticmethod
+    def get_column_setters(tde_columns, prepared=False):
+        return [c.get_setter(idx, prepared) for idx, c in enumerate(tde_columns)]
+
     @staticmethod
     def get_table_definition(tde_columns):
         td = TableDefinition()
@@ -110,63 +412,438 @@ class TdeWriter(object):
         return td
 
 
+def _partition_reader(connection_string, query, batch_size, output_queue, partition):
+    stats = metrics.PipelineStats()
+    error = None
+    try:
+        s = sql.get_helper(connection_string)
+        batches = s.execute_query_batches(query, batch_size, lambda metadata: output_queue.put(['metadata', metadata]))
+        for rows in stats.timed_fetch(batches):
+            output_queue.put(['rows', [tuple(r) for r in rows]])
+    except Exception as ex:
+        error = ex.message or str(ex)
+        log.exception(ex.message)
+    finally:
+        output_queue.put(['done', partition, stats.rows_read, stats.fetch_time, error])
+
+
+# How often the partition and CSV readers check for worker processes that died without reporting.
+WORKER_POLL_INTERVAL = 1.0
+
+
 class TdeGenerator(object):
-    def __init__(self, connection_string, sql_file_path, tde_file_path):
+    def __init__(self, connection_string, sql_file_path, tde_file_path, batch_size=sql.DEFAULT_BATCH_SIZE, reuse_row=True,
+                 partition_column=None, partitions=1, queue_size=channel.DEFAULT_CHANNEL_CAPACITY, sink_factory=None,
+                 progress_interval=0, stats_file_path=None, incremental_column=None, state_file_path=None, columnar=True,
+                 schema_cache_path=None, spill_rows=0, spill_dir=None, fast_strings=True,
+                 string_cache_sample=tde_strings.DEFAULT_CARDINALITY_SAMPLE, checkpoint_column=None, checkpoint_file_path=None,
+                 checkpoint_interval=checkpoint.DEFAULT_CHECKPOINT_INTERVAL, resume=False, tables=None, stage_path=None,
+                 stage_format=None, from_stage_path=None, csv_source=None, strict=False):
+        if csv_source is not None:
+            if tables is not None or from_stage_path or incremental_column or checkpoint_column or schema_cache_path or partition_column:
+                raise ValueError('A CSV source is read as a single table and cannot be combined with SQL tables, stage files, incremental loads, checkpoints, schema caches or partition columns.')
+        if stage_path or from_stage_path:
+            if tables is not None or incremental_column or checkpoint_column or schema_cache_path:
+                raise ValueError('Stage files hold a single table and cannot be combined with incremental loads, checkpoints or schema caches.')
+        if tables is not None:
+            if incremental_column or checkpoint_column or schema_cache_path or (partition_column and partitions > 1):
+                raise ValueError('Incremental loads, checkpoints, schema caches and partitioned reads need a single query, not several tables.')
+            names = [name for name, sql_file_path in tables]
+            if len(set(names)) != len(names):
+                raise ValueError('Table names must be unique.')
         self.connection_string = connection_string
         self.sql_file_path = sql_file_path
+        self.tables = tables
+        self.stage_path = stage_path
+        self.stage_format = stage_format
+        self.from_stage_path = from_stage_path
+        self.csv_source = csv_source
         self.tde_file_path = tde_file_path
+        self.batch_size = batch_size
+        self.reuse_row = reuse_row
+        self.columnar = columnar
+        self.fast_strings = fast_strings
+        self.string_cache_sample = string_cache_sample
+        self.strict = strict
+        self.partition_column = partition_column
+        self.partitions = partitions
+        self.queue_size = queue_size
+        self.spill_rows = spill_rows
+        self.spill_dir = spill_dir
+        self.sink_factory = sink_factory
+        self.progress_interval = progress_interval
+        self.stats_file_path = stats_file_path
+        self.schema_cache_path = schema_cache_path
+        self.stats = None
+        self.errors = list()
+        self.high_water_mark = None
+        if incremental_column:
+            self.high_water_mark = incremental.HighWaterMark(state_file_path or '{}.state.json'.format(tde_file_path), incremental_column)
+        self.checkpoint = None
+        self.checkpoint_interval = checkpoint_interval
+        self.resumed = False
+        if checkpoint_column:
+            if partition_column and partitions > 1:
+                raise ValueError('Checkpoints need a single ordered query and cannot be combined with partitioned reads.')
+            self.checkpoint = checkpoint.Checkpoint(checkpoint_file_path or '{}.checkpoint.json'.format(tde_file_path), checkpoint_column)
+            self.resumed = resume and self.checkpoint.exists() and path.exists(tde_file_path)
+            if not self.resumed:
+                # The checkpoint file itself is only removed by execute(), so --dry-run leaves it in place.
+                self.checkpoint.reset()
+
+    def _sql_reader(self, output_queue, table_name=sink.DEFAULT_TABLE_NAME, sql_file_path=None):
+        name = 'SQL Reader' if self.tables is None else 'SQL Reader for "{}"'.format(table_name)
+        log.info('Starting {}...'.format(name))
+        row_count = 0
+        try:
+            query = self.get_query(sql_file_path)
+            s = sql.get_helper(self.connection_string)
+            batches = s.execute_query_batches(query, self.batch_size, lambda metadata: self.put_metadata(output_queue, metadata, table_name))
+            for rows in self.stats.timed_fetch(batches):
+                output_queue.put(['rows', rows, table_name])
+                row_count += len(rows)
+            log.info('{} is complete. Rows: {}'.format(name, row_count))
+        except channel.ChannelClosed:
+            log.warning('{} stopped after {} rows: the TDE Writer is no longer accepting rows.'.format(name, row_count))
+        except Exception as ex:
+            error = ex.message or str(ex)
+            self.errors.append(error if self.tables is None else '{}: {}'.format(table_name, error))
+            log.exception(ex.message)
+
+    def _stage_reader(self, output_queue):
+        log.info('Starting Stage Reader...')
+        row_count = 0
+        try:
+            with stage.StageReader(self.from_stage_path) as reader:
+                self.put_metadata(output_queue, reader.metadata)
+                for rows in self.stats.timed_fetch(reader.read_batches()):
+                    output_queue.put(['rows', rows, sink.DEFAULT_TABLE_NAME])
+                    row_count += len(rows)
+            log.info('Stage Reader is complete. Rows: {}'.format(row_count))
+        except channel.ChannelClosed:
+            log.warning('Stage Reader stopped after {} rows: the TDE Writer is no longer accepting rows.'.format(row_count))
+        except Exception as ex:
+            self.errors.append(ex.message or str(ex))
+            log.exception(ex.message)
+
+    def _partitioned_sql_reader(self, output_queue):
+        log.info('Starting partitioned SQL Reader...')
+        row_count = 0
+        workers = list()
+        try:
+            query = self.get_query()
+            s = sql.get_helper(self.connection_string)
+            bounds_query = 'SELECT MIN({0}), MAX({0}) FROM ({1}) bounds_q'.format(self.partition_column, self.strip_query(query))
+            lower, upper = next(s.execute_query(bounds_query))
+            if lower is None:
+                log.info('Partitioned SQL Reader is complete. Rows: 0')
+                return
+            queries = self.get_partition_queries(query, self.partition_column, lower, upper, self.partitions)
+
+            from multiprocessing import Process, Queue
+            partition_queue = Queue(len(queries) * 4)
+            workers = [Process(target=_partition_reader, args=(self.connection_string, q, self.batch_size, partition_queue, idx))
+                       for idx, q in enumerate(queries)]
+            for w in workers:
+                w.start()
+            log.debug('Partitioned SQL Reader: started {} workers.'.format(len(workers)))
+
+            row_count = self.forward_worker_batches(partition_queue, workers, output_queue, 'Partition')
+            for w in workers:
+                w.join()
+            log.info('Partitioned SQL Reader is complete. Rows: {}'.format(row_count))
+        except channel.ChannelClosed:
+            log.warning('Partitioned SQL Reader stopped after {} rows: the TDE Writer is no longer accepting rows.'.format(row_count))
+        except Exception as ex:
+            self.errors.append(ex.message or str(ex))
+            log.exception(ex.message)
+        finally:
+            for w in workers:
+                if w.is_alive():
+                    w.terminate()
 
-    def _sql_reader(self, output_queue):
-        log.info('Starting SQL Reader...')
+    def _csv_reader(self, output_queue):
+        log.info('Starting CSV Reader...')
         row_count = 0
+        workers = list()
+        parse_errors = dict()
         try:
-            query = self.read_file(self.sql_file_path)
-            s = sql.SqlHelper(self.connection_string)
-            for row in s.execute_query(query):
-                if row_count == 0:
-                    output_queue.put(['metadata', s.metadata])
-                    log.debug('SQL Reader: put metadata.')
-                output_queue.put(['row', row])
-                row_count += 1
-            log.info('SQL Reader is complete. Rows: {}'.format(row_count))
+            source = self.csv_source
+            metadata = source.infer_metadata()
+            log.debug('CSV Reader: inferred columns {}.'.format(', '.join('{} {}'.format(c[0], c[1].__name__) for c in metadata)))
+            if source.multiline:
+                log.warning('CSV Reader: quoted fields span several lines, so the file is parsed by a single worker.')
+            self.put_metadata(output_queue, metadata)
+            if source.workers is None:
+                from multiprocessing import cpu_count
+                worker_count = cpu_count()
+            else:
+                worker_count = max(1, source.workers)
+            chunks = source.get_chunks(worker_count)
+            worker_count = min(worker_count, len(chunks))
+            if worker_count <= 1:
+                for start, end in chunks:
+                    for rows in self.stats.timed_fetch(source.read_batches(metadata, start, end, self.batch_size, parse_errors)):
+                        output_queue.put(['rows', rows, sink.DEFAULT_TABLE_NAME])
+                        row_count += len(rows)
+            else:
+                from multiprocessing import Process, Queue
+                chunk_queue = Queue()
+                for chunk in chunks:
+                    chunk_queue.put(chunk)
+                for idx in range(worker_count):
+                    chunk_queue.put(None)
+                worker_queue = Queue(worker_count * 4)
+                workers = [Process(target=csv_source.read_chunks, args=(source, metadata, self.batch_size, chunk_queue, worker_queue, idx))
+                           for idx in range(worker_count)]
+                for w in workers:
+                    w.start()
+                log.debug('CSV Reader: started {} workers for {} chunks.'.format(len(workers), len(chunks)))
+                row_count = self.forward_worker_batches(worker_queue, workers, output_queue, 'CSV worker', parse_errors)
+                for w in workers:
+                    w.join()
+            if parse_errors:
+                log.warning('CSV values that do not match the inferred column type were loaded as NULL: {}.'.format(json.dumps(parse_errors, sort_keys=True)))
+            log.info('CSV Reader is complete. Rows: {}'.format(row_count))
+        except channel.ChannelClosed:
+            log.warning('CSV Reader stopped after {} rows: the TDE Writer is no longer accepting rows.'.format(row_count))
         except Exception as ex:
+            self.errors.append(ex.message or str(ex))
             log.exception(ex.message)
+        finally:
+            for w in workers:
+                if w.is_alive():
+                    w.terminate()
+
+    def forward_worker_batches(self, worker_queue, workers, output_queue, label, parse_errors=None):
+        # Passes batches from worker processes to the writer until every worker has reported it is done,
+        # or has died without reporting (killed, or crashed in the driver).
+        row_count = 0
+        has_metadata = False
+        untyped_metadata = None
+        pending = set(range(len(workers)))
+        exited = set()
+        while pending:
+            try:
+                data = worker_queue.get(timeout=WORKER_POLL_INTERVAL)
+            except Empty:
+                # A worker that exited is only given up on after a further quiet interval, in case its last
+                # messages were still on their way.
+                for idx in sorted(pending & exited):
+                    pending.discard(idx)
+                    self.errors.append('{} {}: the worker process exited with code {} before finishing.'.format(label, idx, workers[idx].exitcode))
+                    log.error(self.errors[-1])
+                exited = set(idx for idx in pending if workers[idx].exitcode is not None)
+                continue
+            if data[0] == 'metadata':
+                # A worker with no rows cannot infer types its driver leaves empty, so its metadata is only used
+                # when no worker returns typed metadata. Workers with rows always send theirs before the rows.
+                if not has_metadata and data[1] is not None and any(d[1] is None for d in data[1]):
+                    untyped_metadata = untyped_metadata or data
+                elif not has_metadata:
+                    output_queue.put(data)
+                    has_metadata = True
+                    log.debug('{}: put metadata.'.format(label))
+            elif data[0] == 'rows':
+                output_queue.put(data)
+                row_count += len(data[1])
+            elif data[0] == 'done':
+                pending.discard(data[1])
+                self.stats.rows_read += data[2]
+                self.stats.fetch_time += data[3]
+                if data[4] is not None:
+                    self.errors.append('{} {}: {}'.format(label, data[1], data[4]))
+                if parse_errors is not None and len(data) > 5:
+                    for name, errors in data[5].items():
+                        parse_errors[name] = parse_errors.get(name, 0) + errors
+                log.debug('{} {} is complete. Rows: {}'.format(label, data[1], data[2]))
+        if not has_metadata and untyped_metadata is not None:
+            output_queue.put(untyped_metadata)
+            log.debug('{}: put metadata.'.format(label))
+        return row_count
 
     def _tde_writer(self, input_queue):
         log.info('Starting TDE Writer...')
         try:
             row_count = 0
-            with TdeWriter(self.tde_file_path) as tde:
+            checkpoint_rows = 0
+            table_rows = dict()
+            with self.get_sink() as tde:
+                cache, cached_metadata = None, None
+                if self.schema_cache_path:
+                    cache = schema_cache.SchemaCache(self.schema_cache_path, self.read_file(self.sql_file_path), self.connection_string)
+                    cached_metadata = cache.load()
+                    if cached_metadata is not None:
+                        # Built while the source query is still running; used once the query confirms the schema.
+                        tde.prepare_metadata(cached_metadata)
+                        log.debug('TDE Extract prepared metadata from the schema cache.')
                 while True:
                     data = input_queue.get()
                     if data is StopIteration:
                         break
+                    # Partition workers send untagged messages; every other reader tags them with its table.
+                    table_name = data[2] if len(data) > 2 else sink.DEFAULT_TABLE_NAME
                     if data[0] == 'metadata':
-                        tde.set_metadata(data[1])
+                        if cache is not None and not cache.check(cached_metadata, data[1]):
+                            if cached_metadata is not None:
+                                log.warning('Schema drift since the last run: {}.'.format(cache.describe_drift(cached_metadata, data[1])))
+                        tde.set_metadata(data[1], table_name)
+                        table_rows.setdefault(table_name, 0)
+                        if self.high_water_mark is not None:
+                            self.high_water_mark.set_metadata(data[1])
+                        if self.checkpoint is not None:
+                            self.checkpoint.set_metadata(data[1])
                         log.debug('TDE Extract setting metadata.')
-                    elif data[0] == 'row':
-                        tde.write_row(data[1])
-                        row_count += 1
+                    elif data[0] == 'rows':
+                        tde.write_rows(data[1], table_name)
+                        if self.high_water_mark is not None:
+                            self.high_water_mark.observe(data[1])
+                        table_rows[table_name] = table_rows.get(table_name, 0) + len(data[1])
+                        row_count += len(data[1])
+                        self.stats.rows_written = row_count
+                        if self.checkpoint is not None:
+                            self.checkpoint.observe(data[1])
+                            checkpoint_rows += len(data[1])
+                            if checkpoint_rows >= self.checkpoint_interval:
+                                tde.flush(lambda: self.save_checkpoint(checkpoint_rows))
+                                checkpoint_rows = 0
+                self.stats.sink_stats = tde.get_stats()
+                if self.errors and isinstance(tde, stage.StageSink):
+                    tde.abort()
+                    log.error('The stage file "{}" was not written because the run had errors.'.format(self.stage_path))
+                elif self.errors and isinstance(tde, TdeWriter) and self.checkpoint is None:
+                    # Without a checkpoint to resume from, rows from a failed run would be loaded again by the next one.
+                    tde.abort()
+                    log.error('The extract "{}" was left as it was before the run because the run had errors.'.format(self.tde_file_path))
+            if self.stats.sink_stats.get('null_coercions'):
+                log.warning('Values that could not be written were loaded as NULL: {}.'.format(json.dumps(self.stats.sink_stats['null_coercions'], sort_keys=True)))
             log.info('TDE Writer is complete. Rows: {}'.format(row_count))
+            if self.tables is not None:
+                for table_name, rows in sorted(table_rows.items()):
+                    log.info('TDE table "{}" rows: {}'.format(table_name, rows))
+            if self.checkpoint is not None:
+                if self.errors:
+                    # The extract was closed cleanly with every row received, so a resumed run continues from here.
+                    self.save_checkpoint(checkpoint_rows)
+                else:
+                    self.checkpoint.clear()
+            if self.high_water_mark is not None:
+                # Rows are not necessarily read in key order, so after a failed read the highest key seen may skip rows.
+                if self.errors:
+                    log.warning('High-water mark for "{}" was not advanced because the run had errors.'.format(self.high_water_mark.column_name))
+                elif isinstance(tde, sink.NullSink):
+                    log.info('High-water mark for "{}" was not advanced because no rows were written.'.format(self.high_water_mark.column_name))
+                else:
+                    self.high_water_mark.save()
+                    log.info('High-water mark for "{}" is now {}.'.format(self.high_water_mark.column_name, self.high_water_mark.value))
         except Exception as ex:
+            self.errors.append(ex.message or str(ex))
             log.exception(ex.message)
+        finally:
+            # Unblocks the reader if the writer stops before the end of the data.
+            input_queue.close()
 
     def execute(self):
         start_time = time.time()
         log.info('Starting TDE Generator...')
+        if self.checkpoint is not None and not self.resumed:
+            self.checkpoint.clear()
+        if self.resumed:
+            log.info('Resuming after {} rows committed, from {} > {}.'.format(self.checkpoint.rows, self.checkpoint.column_name, self.checkpoint.value))
+
+        self.stats = metrics.PipelineStats()
+        progress = None
+        if self.progress_interval > 0:
+            progress = metrics.ProgressReporter(self.stats, self.progress_interval, self.log_progress)
+            progress.start()
 
-        data_queue = Queue()
+        data_queue = self.get_channel()
         consumer = Thread(target=self._tde_writer, args=(data_queue,))
         consumer.start()
-        producer = Thread(target=self._sql_reader, args=(data_queue,))
-        producer.start()
+        if self.from_stage_path:
+            producers = [Thread(target=self._stage_reader, args=(data_queue,))]
+        elif self.csv_source is not None:
+            producers = [Thread(target=self._csv_reader, args=(data_queue,))]
+        elif self.tables is not None:
+            # One reader per table, each on its own pooled connection; the single writer serializes the inserts.
+            producers = [Thread(target=self._sql_reader, args=(data_queue, name, sql_file_path)) for name, sql_file_path in self.tables]
+        elif self.partition_column and self.partitions > 1:
+            producers = [Thread(target=self._partitioned_sql_reader, args=(data_queue,))]
+        else:
+            producers = [Thread(target=self._sql_reader, args=(data_queue,))]
+        for producer in producers:
+            producer.start()
 
-        producer.join()
-        data_queue.put(StopIteration)
+        for producer in producers:
+            producer.join()
+        try:
+            data_queue.put(StopIteration)
+        except channel.ChannelClosed:
+            pass
         consumer.join()
+        data_queue.close()
+
+        if progress is not None:
+            progress.stop()
+            progress.join()
+        self.stats.queue_stats = data_queue.get_stats()
+        self.stats.finish()
+        summary = self.stats.get_summary()
+        log.info('TDE Generator summary: {}'.format(json.dumps(summary, sort_keys=True)))
+        if self.stats_file_path:
+            with open(self.stats_file_path, 'w') as f:
+                json.dump(summary, f, indent=2, sort_keys=True)
 
         log.info('Total TDE Generator elapsed time: {}'.format(time.time() - start_time))
 
+    def save_checkpoint(self, rows):
+        self.checkpoint.rows += rows
+        self.checkpoint.save()
+        log.debug('Checkpoint: {} rows committed, last {} is {}.'.format(self.checkpoint.rows, self.checkpoint.column_name, self.checkpoint.value))
+
+    @staticmethod
+    def put_metadata(output_queue, metadata, table_name=sink.DEFAULT_TABLE_NAME):
+        output_queue.put(['metadata', metadata, table_name])
+        log.debug('SQL Reader: put metadata for "{}".'.format(table_name))
+
+    @staticmethod
+    def log_progress(sample):
+        log.info('Progress: {rows_written} rows written, {rows_read} rows read, {rows_per_second:.0f} rows/sec'.format(**sample))
+
+    def get_channel(self):
+        if self.spill_rows > 0:
+            return channel.SpillingChannel(self.spill_rows, self.spill_dir)
+        return channel.BatchChannel(self.queue_size)
+
+    def get_sink(self):
+        if self.sink_factory is not None:
+            return self.sink_factory()
+        if self.stage_path:
+            return stage.StageSink(self.stage_path, self.stage_format)
+        return TdeWriter(self.tde_file_path, self.reuse_row, append=self.high_water_mark is not None or self.resumed, columnar=self.columnar,
+                         fast_strings=self.fast_strings, string_cache_sample=self.string_cache_sample, strict=self.strict)
+
+    def validate(self):
+        # Checks the SQL scripts and the source without touching the extract or loading the Tableau SDK.
+        if self.from_stage_path:
+            with stage.StageReader(self.from_stage_path):
+                return
+        if self.csv_source is not None:
+            self.csv_source.infer_metadata()
+            return
+        for name, sql_file_path in self.tables or [(sink.DEFAULT_TABLE_NAME, self.sql_file_path)]:
+            if not self.strip_query(self.get_query(sql_file_path)):
+                raise ValueError('The SQL script "{}" is empty.'.format(sql_file_path))
+        sql.get_helper(self.connection_string).check_connection()
+
+    def get_query(self, sql_file_path=None):
+        query = self.read_file(sql_file_path or self.sql_file_path)
+        if self.high_water_mark is not None:
+            query = self.high_water_mark.apply(query)
+        if self.checkpoint is not None:
+            query = self.checkpoint.apply(query)
+        return query
+
     @staticmethod
     def read_file(file_path):
         if not path.exists(file_path):
@@ -174,16 +851,138 @@ class TdeGenerator(object):
         with codecs.open(file_path, 'r', 'utf-8') as f:
             return f.read()
 
+    @staticmethod
+    def strip_query(query):
+        return query.strip().rstrip(';')
+
+    @staticmethod
+    def get_partition_queries(query, column, lower, upper, partitions):
+        if isinstance(lower, bool) or not isinstance(lower, (int, long, float, decimal.Decimal)):
+            raise Exception('Partition column "{}" must be numeric.'.format(column))
+        if isinstance(lower, decimal.Decimal) or isinstance(upper, decimal.Decimal):
+            lower, upper = float(lower), float(upper)
+        if isinstance(lower, (int, long)) and isinstance(upper, (int, long)):
+            step = max(1, -(-(upper - lower + 1) // partitions))
+        else:
+            step = (upper - lower) / float(partitions)
+        query = TdeGenerator.strip_query(query)
+        # Each boundary is computed once, so a partition's upper bound is exactly the next one's lower bound.
+        bounds = [lower + step * idx for idx in range(partitions)] + [upper]
+        queries = list()
+        for idx in range(partitions):
+            start = bounds[idx]
+            if start > upper:
+                break
+            predicates = list()
+            if idx > 0:
+                predicates.append('{} >= {}'.format(column, sql.to_sql_literal(start)))
+            if idx < partitions - 1 and bounds[idx + 1] <= upper:
+                predicates.append('{} < {}'.format(column, sql.to_sql_literal(bounds[idx + 1])))
+            where = ' AND '.join(predicates) if predicates else '1 = 1'
+            # Rows with a NULL partition key belong to no range, so the first partition picks them up.
+            if idx == 0:
+                where = '({}) OR {} IS NULL'.format(where, column)
+            queries.append('SELECT * FROM ({}) partition_q WHERE {}'.format(query, where))
+        return queries
+
 
 def main(argv):
     parser = argparse.ArgumentParser(prog='tde.py', description='Extracts data from an ODBC connection to a Tableau Data Extract (TDE) file.')
-    parser.add_argument('--tde', required=True, metavar='<tde_file_path>', help='The file path to output the TDE file.')
-    parser.add_argument('--cn', required=True, metavar='<ODBC_Connection_String>', help='A valid ODBC connection string to connect to the data source')
-    parser.add_argument('--sql', required=True, metavar='<sql_script_file_path>', help='The file path to the source SQL (.sql) script.')
+    parser.add_argument('--tde', metavar='<tde_file_path>', help='The file path to output the TDE file. Not used with --stage.')
+    parser.add_argument('--cn', metavar='<ODBC_Connection_String>', help='A valid ODBC connection string to connect to the data source. Include "module=<name>" to connect through that DB-API 2.0 module instead, e.g. "module=sqlite3;database=local.db". Connections are pooled per connection string; "pool_size=<n>" (0 disables pooling) and "pool_idle_timeout=<seconds>" tune the pool. "arraysize", "packet_size", "readonly" and "query_timeout" tune queries; see the options below.')
+    parser.add_argument('--sql', metavar='<sql_script_file_path>', help='The file path to the source SQL (.sql) script, written to the "Extract" table.')
+    parser.add_argument('--table', action='append', metavar='<table_name>=<sql_script_file_path>', help='Write the results of a SQL script to the named table. Repeat for several tables in the same extract; their queries run concurrently. Use instead of --sql.')
+    parser.add_argument('--batch-size', type=int, default=sql.DEFAULT_BATCH_SIZE, metavar='<rows>', help='The number of rows fetched from the source and passed to the TDE writer at a time. Default: {}'.format(sql.DEFAULT_BATCH_SIZE))
+    parser.add_argument('--arraysize', type=int, metavar='<rows>', help='The cursor arraysize, i.e. how many rows each fetch returns, in place of --batch-size. pyodbc does not prefetch by arraysize, so with ODBC sources this only sets the fetch and batch size; other DB-API drivers may use it to size network round trips. Same as "arraysize=<rows>" in --cn. Default: --batch-size')
+    parser.add_argument('--packet-size', type=int, metavar='<bytes>', help='The ODBC network packet size. Same as "packet_size=<bytes>" in --cn. Default: the driver\'s')
+    parser.add_argument('--readonly', action='store_true', help='Open ODBC connections read-only. Same as "readonly=yes" in --cn. Cursors are always forward-only.')
+    parser.add_argument('--query-timeout', type=int, metavar='<seconds>', help='The ODBC query timeout. Same as "query_timeout=<seconds>" in --cn. Default: 0 (none)')
+    parser.add_argument('--stage', metavar='<stage_file_path>', help='Write the fetched rows to this staging file instead of an extract, so the source query is released as soon as it is read. Build the extract from it later with --from-stage.')
+    parser.add_argument('--stage-format', choices=stage.STAGE_FORMATS, help='The --stage file format: "arrow" (Arrow IPC, needs pyarrow) or "builtin". Default: arrow when pyarrow is installed, builtin otherwise')
+    parser.add_argument('--from-stage', metavar='<stage_file_path>', help='Build the extract from a file written with --stage instead of querying the source. --cn, --sql and --table are not used.')
+    parser.add_argument('--csv', metavar='<csv_file_path>', help='Build the extract from a CSV file instead of querying a source. Column types are inferred from a sample of the file and chunks of it are parsed in parallel. --cn, --sql and --table are not used.')
+    parser.add_argument('--csv-delimiter', default=',', metavar='<character>', help='The --csv field delimiter. Default: ,')
+    parser.add_argument('--csv-encoding', default='utf-8', metavar='<encoding>', help='The --csv text encoding. Default: utf-8')
+    parser.add_argument('--csv-no-header', action='store_true', help='The --csv file has no header row; columns are named F1, F2, ...')
+    parser.add_argument('--csv-sample-rows', type=int, default=csv_source.DEFAULT_SAMPLE_ROWS, metavar='<rows>', help='The number of leading --csv rows used to infer the column types. Default: {}'.format(csv_source.DEFAULT_SAMPLE_ROWS))
+    parser.add_argument('--csv-workers', type=int, metavar='<count>', help='The number of worker processes parsing --csv chunks. Chunks are split at line breaks, so use 1 when quoted fields hold line breaks beyond the sample rows. Default: the number of CPUs')
+    parser.add_argument('--dry-run', action='store_true', help='Check that the SQL script can be read and the source can be connected to, then exit without writing the extract or loading the Tableau SDK.')
+    parser.add_argument('--no-row-reuse', action='store_true', help='Allocate a new TDE row for every record instead of overwriting a single row buffer.')
+    parser.add_argument('--no-columnar', action='store_true', help='Convert date and time values cell by cell instead of a column of each batch at a time.')
+    parser.add_argument('--no-fast-strings', action='store_true', help='Set Unicode string values through the SDK\'s Row.setString instead of the buffered string path.')
+    parser.add_argument('--string-cache-sample', type=int, default=tde_strings.DEFAULT_CARDINALITY_SAMPLE, metavar='<values>', help='The number of leading values of each Unicode string column used to detect low-cardinality columns, whose converted values are then cached. 0 disables the cache. Default: {}'.format(tde_strings.DEFAULT_CARDINALITY_SAMPLE))
+    parser.add_argument('--strict', action='store_true', help='Fail on the first value that cannot be written to its TDE column, e.g. an integer out of range, instead of writing NULL and counting it per column.')
+    parser.add_argument('--queue-size', type=int, default=channel.DEFAULT_CHANNEL_CAPACITY, metavar='<batches>', help='The maximum number of batches buffered between the reader and the TDE writer. Default: {}'.format(channel.DEFAULT_CHANNEL_CAPACITY))
+    parser.add_argument('--spill-rows', type=int, default=0, metavar='<rows>', help='Buffer up to this many rows in memory between the reader and the TDE writer and spill further batches to disk, so the source query is never throttled by the writer. Replaces --queue-size. Default: 0 (off)')
+    parser.add_argument('--spill-dir', metavar='<directory>', help='The directory for --spill-rows segment files. Default: the system temporary directory')
+    parser.add_argument('--sink', choices=['tde', 'null'], default='tde', help='Where rows are written. "null" discards them, to measure source and pipeline throughput without the Tableau SDK. Default: tde')
+    parser.add_argument('--progress-interval', type=float, default=0, metavar='<seconds>', help='Log progress and throughput at this interval. Default: 0 (off)')
+    parser.add_argument('--stats-file', metavar='<json_file_path>', help='The file path to write the run summary (per-stage timings and counters) to as JSON.')
+    parser.add_argument('--incremental-column', metavar='<column_name>', help='Append only rows whose value in this column is above the last loaded value to the existing extract. The SQL script must contain a ${incremental_filter} placeholder, e.g. "WHERE ${incremental_filter}".')
+    parser.add_argument('--state-file', metavar='<json_file_path>', help='The file path that stores the last loaded --incremental-column value. Default: <tde_file_path>.state.json')
+    parser.add_argument('--schema-cache', metavar='<json_file_path>', help='A file that caches the resolved column mapping of the query, so the extract table definition is built before the query returns and schema drift is reported.')
+    parser.add_argument('--checkpoint-column', metavar='<column_name>', help='A unique key the query is ordered by. The extract is committed every --checkpoint-interval rows and the last key written is recorded, so a failed run can be resumed with --resume. The SQL script must contain a ${resume_filter} placeholder, e.g. "WHERE ${resume_filter} ORDER BY id".')
+    parser.add_argument('--checkpoint-file', metavar='<json_file_path>', help='The file path that stores the --checkpoint-column progress. Default: <tde_file_path>.checkpoint.json')
+    parser.add_argument('--checkpoint-interval', type=int, default=checkpoint.DEFAULT_CHECKPOINT_INTERVAL, metavar='<rows>', help='The number of rows written between checkpoints. Each checkpoint also copies the extract, so a failed run can be restored to it. Default: {}'.format(checkpoint.DEFAULT_CHECKPOINT_INTERVAL))
+    parser.add_argument('--resume', action='store_true', help='Append to the existing extract from the last checkpoint instead of starting over. Starts over when there is no checkpoint.')
+    parser.add_argument('--partition-column', metavar='<column_name>', help='A numeric column of the query results used to split the query into key ranges read in parallel.')
+    parser.add_argument('--partitions', type=int, default=1, metavar='<count>', help='The number of key ranges (and worker processes) used with --partition-column. Default: 1')
     args = vars(parser.parse_args())
+    if not args['tde'] and not args['stage']:
+        parser.error('--tde is required unless --stage is given.')
+    if args['stage'] and args['from_stage']:
+        parser.error('--stage and --from-stage cannot be combined.')
+    if args['csv'] and args['from_stage']:
+        parser.error('--csv and --from-stage cannot be combined.')
+    file_source = args['from_stage'] or args['csv']
+    if not file_source and not args['cn']:
+        parser.error('--cn is required unless --from-stage or --csv is given.')
+    if not file_source and bool(args['sql']) == bool(args['table']):
+        parser.error('Either --sql or --table is required, but not both.')
+    if len(args['csv_delimiter']) != 1:
+        parser.error('--csv-delimiter must be a single character.')
+    tables = None
+    if args['table']:
+        tables = list()
+        for table in args['table']:
+            if '=' not in table:
+                parser.error('--table must be given as <table_name>=<sql_script_file_path>.')
+            tables.append(tuple(table.split('=', 1)))
+    configure_logging()
 
-    tde = TdeGenerator(args['cn'], args['sql'], args['tde'])
-    tde.execute()
+    sink_factory = sink.NullSink if args['sink'] == 'null' else None
+    connection_string = None
+    if args['cn']:
+        connection_string = sql.add_connection_options(args['cn'], arraysize=args['arraysize'], packet_size=args['packet_size'],
+                                                       readonly='yes' if args['readonly'] else None, query_timeout=args['query_timeout'])
+    source = None
+    if args['csv']:
+        source = csv_source.CsvSource(args['csv'], args['csv_delimiter'], encoding=args['csv_encoding'], header=not args['csv_no_header'],
+                                      sample_rows=args['csv_sample_rows'], workers=args['csv_workers'])
+    tde = TdeGenerator(connection_string, args['sql'], args['tde'], args['batch_size'], not args['no_row_reuse'],
+                       partition_column=args['partition_column'], partitions=args['partitions'], queue_size=args['queue_size'],
+                       sink_factory=sink_factory, progress_interval=args['progress_interval'], stats_file_path=args['stats_file'],
+                       incremental_column=args['incremental_column'], state_file_path=args['state_file'], columnar=not args['no_columnar'],
+                       schema_cache_path=args['schema_cache'], spill_rows=args['spill_rows'], spill_dir=args['spill_dir'],
+                       fast_strings=not args['no_fast_strings'], string_cache_sample=args['string_cache_sample'],
+                       checkpoint_column=args['checkpoint_column'], checkpoint_file_path=args['checkpoint_file'],
+                       checkpoint_interval=args['checkpoint_interval'], resume=args['resume'], tables=tables,
+                       stage_path=args['stage'], stage_format=args['stage_format'], from_stage_path=args['from_stage'],
+                       csv_source=source, strict=args['strict'])
+    try:
+        if args['dry_run']:
+            try:
+                tde.validate()
+            except Exception as ex:
+                log.error('Dry run failed: {}'.format(ex.message or str(ex)))
+                sys.exit(1)
+            log.info('Dry run succeeded: the {} valid.'.format('CSV file is' if source is not None else 'SQL script and connection string are'))
+        else:
+            tde.execute()
+            if tde.errors:
+                sys.exit(1)
+    finally:
+        sql.close_pools()
 
 if __name__ == '__main__':
     main(sys.argv)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+from ctypes import byref, c_wchar, c_wchar_p, create_string_buffer, sizeof, string_at
+
+# Imported by is_available(), when the writer is created, so the SDK's native libraries are not loaded at startup.
+Result = TableauException = extract_lib = common_lib = None
+
+
+DEFAULT_STRING_CACHE_SIZE = 0
+DEFAULT_CARDINALITY_SAMPLE = 1000
+MAX_DISTINCT_RATIO = 0.2
+MIN_STRING_CACHE_SIZE = 256
+MAX_STRING_CACHE_SIZE = 16384
+INITIAL_BUFFER_CHARS = 256
+WCHAR_SIZE = sizeof(c_wchar)
+
+
+def is_available():
+    global Result, TableauException, extract_lib, common_lib
+    if extract_lib is None:
+        try:
+            from tableausdk import Result, TableauException
+            from tableausdk.Extract import extract_lib
+            from tableausdk.StringUtils import common_lib
+        except ImportError:
+            return False
+    return True
+
+
+def get_cache_size(distinct, sampled):
+    if not sampled or distinct > sampled * MAX_DISTINCT_RATIO:
+        return 0
+    return min(max(4 * distinct, MIN_STRING_CACHE_SIZE), MAX_STRING_CACHE_SIZE)
+
+
+class StringSetter(object):
+    # Row.setString converts every cell through StringUtils.ToTableauString, which allocates a fresh conversion buffer
+    # per call. This converts into a single grow-only buffer per column and passes it straight to TabRowSetString.
+    # With a cache size, recently converted values are kept in two generations of plain dicts, a cheap approximation of
+    # an LRU: a value seen in the previous generation is promoted, and the older generation is dropped when the newer
+    # one fills up. Caching only pays off for columns that repeat values, so it is off by default; with a sample size,
+    # the first values of the column are all cached and their number of distinct values decides the cache size.
+    def __init__(self, cache_size=DEFAULT_STRING_CACHE_SIZE, sample_size=0):
+        self.cache_size = sample_size or cache_size
+        self.sample_remaining = sample_size
+        self.sampled_distinct = None
+        self.hits = 0
+        self.misses = 0
+        self.recent = dict()
+        self.previous = dict()
+        self.buffer = create_string_buffer(WCHAR_SIZE * INITIAL_BUFFER_CHARS)
+        self.buffer_size = WCHAR_SIZE * INITIAL_BUFFER_CHARS
+
+    def convert(self, value):
+        if not isinstance(value, unicode):
+            value = unicode(value)
+        size = WCHAR_SIZE * (len(value) + 1)
+        if size > self.buffer_size:
+            self.buffer_size = max(size, 2 * self.buffer_size)
+            self.buffer = create_string_buffer(self.buffer_size)
+        common_lib.ToTableauString(c_wchar_p(value), byref(self.buffer))
+        return self.buffer, size
+
+    def lookup(self, value):
+        if self.sample_remaining:
+            self.sample_remaining -= 1
+            if not self.sample_remaining:
+                self.end_sample()
+        converted = self.recent.get(value)
+        if converted is not None:
+            self.hits += 1
+            return converted
+        converted = self.previous.get(value)
+        if converted is None:
+            self.misses += 1
+            buffer, size = self.convert(value)
+            if not self.cache_size:
+                return buffer
+            converted = string_at(buffer, size)
+        else:
+            self.hits += 1
+        if len(self.recent) >= self.cache_size:
+            self.previous = self.recent
+            self.recent = dict()
+        self.recent[value] = converted
+        return converted
+
+    def end_sample(self):
+        # The sample cache never evicts, so every miss so far was a distinct value.
+        self.sampled_distinct = len(self.recent) + len(self.previous)
+        self.cache_size = get_cache_size(self.sampled_distinct, self.hits + self.misses)
+        if not self.cache_size:
+            self.recent = dict()
+            self.previous = dict()
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / lookups if lookups else None,
+            'cache_size': self.cache_size,
+            'sampled_distinct': self.sampled_distinct,
+        }
+
+    def set(self, row, idx, value):
+        # ctypes passes a plain int as a C int, so the c_int wrapper Row.setString builds per call is not needed.
+        result = extract_lib.TabRowSetString(row._handle, idx, self.lookup(value))
+        if result != Result.SUCCESS:
+            raise TableauException(result, 'Failed to set string column {}.'.format(idx))
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import convert
+import datetime
+
+
+# TDE date-times and durations take fractions of a second in units of 100 microseconds.
+MICROSECONDS_PER_FRAC = 100
+DEFAULT_PARTS_CACHE_SIZE = 65536
+DEFAULT_PARTS_SAMPLE = 1000
+MAX_DISTINCT_RATIO = 0.5
+
+
+def get_date_parts(value):
+    return value.year, value.month, value.day
+
+
+def get_datetime_parts(value):
+    if type(value) is datetime.date:
+        return value.year, value.month, value.day, 0, 0, 0, 0
+    return value.year, value.month, value.day, value.hour, value.minute, value.second, value.microsecond // MICROSECONDS_PER_FRAC
+
+
+def get_duration_parts(value):
+    # TIME columns come back as datetime.time from most drivers and as datetime.timedelta from some.
+    if isinstance(value, datetime.timedelta):
+        seconds = value.seconds
+        return value.days, seconds // 3600, seconds // 60 % 60, seconds % 60, value.microseconds // MICROSECONDS_PER_FRAC
+    return 0, value.hour, value.minute, value.second, value.microsecond // MICROSECONDS_PER_FRAC
+
+
+def to_datetime_parts(values):
+    if convert.get_numpy() is not None:
+        try:
+            return _numpy_datetime_parts(values), 0
+        except (TypeError, ValueError):
+            pass
+    # Inlined rather than calling get_datetime_parts; a datetime.date value fails here and is converted by the slow path.
+    return [None if v is None else (v.year, v.month, v.day, v.hour, v.minute, v.second, v.microsecond // MICROSECONDS_PER_FRAC)
+            for v in values], 0
+
+
+def _numpy_datetime_parts(values):
+    numpy = convert.get_numpy()
+    null_positions = convert.get_null_positions(values)
+    stamps = numpy.array(values, dtype='datetime64[us]')
+    days = stamps.astype('datetime64[D]')
+    month_starts = stamps.astype('datetime64[M]')
+    years = stamps.astype('datetime64[Y]').astype(numpy.int64) + 1970
+    months = month_starts.astype(numpy.int64) % 12 + 1
+    month_days = (days - month_starts.astype('datetime64[D]')).astype(numpy.int64) + 1
+    microseconds = (stamps - days).astype(numpy.int64)
+    seconds = microseconds // 1000000
+    parts = zip(years.tolist(), months.tolist(), month_days.tolist(), (seconds // 3600).tolist(), (seconds // 60 % 60).tolist(),
+                (seconds % 60).tolist(), (microseconds % 1000000 // MICROSECONDS_PER_FRAC).tolist())
+    return convert.restore_nulls(parts, null_positions)
+
+
+class PartsConverter(object):
+    # Converts a temporal column to setter arguments. Fact tables repeat the same dates and timestamps
+    # many times, so the parts are memoized by value; when the leading values turn out to be mostly
+    # distinct, the cache is dropped and the column is converted in bulk instead.
+    def __init__(self, get_parts, convert_bulk=None, sample_size=DEFAULT_PARTS_SAMPLE, cache_size=DEFAULT_PARTS_CACHE_SIZE):
+        self.get_parts = get_parts
+        self.convert_bulk = convert_bulk
+        self.sample_size = sample_size
+        self.cache_size = cache_size
+        self.cache = dict()
+        self.caching = sample_size > 0 and cache_size > 0
+        self.sampling = self.caching
+        self.sampled = 0
+        self.hits = 0
+        self.misses = 0
+
+    def convert(self, values):
+        if not self.caching:
+            if self.convert_bulk is not None:
+                return self.convert_bulk(values)
+            get_parts = self.get_parts
+            return [None if v is None else get_parts(v) for v in values], 0
+        cache = self.cache
+        lookup = cache.get
+        get_parts = self.get_parts
+        parts = list()
+        append = parts.append
+        misses = 0
+        nulls = 0
+        for v in values:
+            p = lookup(v)
+            if p is None:
+                if v is None:
+                    nulls += 1
+                else:
+                    p = get_parts(v)
+                    cache[v] = p
+                    misses += 1
+            append(p)
+        self.misses += misses
+        self.hits += len(values) - nulls - misses
+        if self.sampling:
+            self.end_sample(len(values) - nulls)
+        if len(cache) > self.cache_size:
+            cache.clear()
+        return parts, 0
+
+    def convert_value(self, value):
+        return self.get_parts(value)
+
+    def end_sample(self, converted):
+        self.sampled += converted
+        if self.sampled < self.sample_size:
+            return
+        self.sampling = False
+        if len(self.cache) > self.sampled * MAX_DISTINCT_RATIO:
+            self.caching = False
+            self.cache = dict()
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            'caching': self.caching,
+        }
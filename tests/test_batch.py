@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch
+
+logging.getLogger(batch.log.name).addHandler(logging.NullHandler())
+
+
+class SleepingJob(batch.BatchJob):
+    # Stands in for a TdeGenerator: records when it ran, so the test can check how jobs overlapped.
+    def get_generator(self):
+        return SleepingGenerator(self.tde_file_path)
+
+
+class SleepingGenerator(object):
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.errors = list()
+        self.stats = None
+
+    def execute(self):
+        start_time = time.time()
+        time.sleep(0.2)
+        with open(self.log_path, 'w') as f:
+            f.write('{} {} {}'.format(os.getpid(), start_time, time.time()))
+        self.stats = type('Stats', (object,), {'rows_written': 10})()
+
+
+class DyingJob(batch.BatchJob):
+    def get_generator(self):
+        # A job process killed by the OOM killer or a crashing driver never reports back.
+        os._exit(9)
+
+
+class BatchRunnerTest(unittest.TestCase):
+    def setUp(self):
+        self.poll_interval = batch.JOB_POLL_INTERVAL
+        batch.JOB_POLL_INTERVAL = 0.1
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        batch.JOB_POLL_INTERVAL = self.poll_interval
+        shutil.rmtree(self.work_dir)
+
+    def make_job(self, job_class, name, server):
+        return job_class(name, 'DRIVER={{x}};SERVER={}'.format(server), None, os.path.join(self.work_dir, name))
+
+    def read_log(self, job):
+        with open(job.tde_file_path) as f:
+            pid, start_time, end_time = f.read().split()
+        return int(pid), float(start_time), float(end_time)
+
+    def test_jobs_run_in_separate_processes(self):
+        jobs = [self.make_job(SleepingJob, 'job_{}'.format(i), 'a' if i < 3 else 'b') for i in range(4)]
+        report = batch.BatchRunner(jobs, workers=3, max_per_source=2).execute()
+        self.assertEqual(report['succeeded'], 4)
+        self.assertEqual([j['rows'] for j in report['jobs']], [10] * 4)
+        logs = [self.read_log(j) for j in jobs]
+        self.assertEqual(len(set([pid for pid, start_time, end_time in logs] + [os.getpid()])), 5)
+        # The third job for source a waits for one of the first two, while the job for source b starts at once.
+        self.assertGreaterEqual(logs[2][1], min(logs[0][2], logs[1][2]))
+        self.assertLess(logs[3][1], logs[0][2])
+
+    def test_dead_job_process_fails_the_job(self):
+        jobs = [self.make_job(DyingJob, 'dying', 'a'), self.make_job(SleepingJob, 'sleeping', 'a')]
+        report = batch.BatchRunner(jobs, workers=2, max_per_source=2).execute()
+        self.assertEqual(report['succeeded'], 1)
+        self.assertEqual(jobs[0].status, 'failed')
+        self.assertIn('code 9', jobs[0].errors[0])
+        self.assertEqual(jobs[1].status, 'succeeded')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import channel
+
+
+class SpillingChannelTest(unittest.TestCase):
+    PRODUCERS = 8
+    BATCHES = 200
+    BATCH_ROWS = 50
+
+    def test_concurrent_producers(self):
+        # Several --table readers share one channel; every spilled batch must be read back intact and in order.
+        c = channel.SpillingChannel(200, segment_bytes=64 * 1024)
+        errors = list()
+
+        def produce(producer):
+            try:
+                for batch in xrange(self.BATCHES):
+                    rows = [(producer, batch, i, u'value {}'.format(i)) for i in xrange(self.BATCH_ROWS)]
+                    c.put(['rows', rows, 'table_{}'.format(producer)])
+            except Exception as ex:
+                errors.append(ex)
+
+        producers = [threading.Thread(target=produce, args=(p,)) for p in range(self.PRODUCERS)]
+        for p in producers:
+            p.start()
+        received = dict()
+        rows_received = 0
+        expected = self.PRODUCERS * self.BATCHES
+        try:
+            for idx in xrange(expected):
+                if idx % 100 == 0:
+                    # A slow writer, so the memory budget fills up and batches spill.
+                    time.sleep(0.01)
+                kind, rows, table_name = c.get()
+                producer = rows[0][0]
+                self.assertEqual(table_name, 'table_{}'.format(producer))
+                self.assertEqual(len(rows), self.BATCH_ROWS)
+                received.setdefault(producer, list()).append(rows[0][1])
+                rows_received += len(rows)
+        finally:
+            for p in producers:
+                p.join()
+            stats = c.get_stats()
+            c.close()
+        self.assertEqual(errors, [])
+        self.assertEqual(rows_received, expected * self.BATCH_ROWS)
+        for producer in range(self.PRODUCERS):
+            self.assertEqual(received[producer], range(self.BATCHES))
+        self.assertGreater(stats['spilled_batches'], 0)
+
+    def test_put_after_close(self):
+        c = channel.SpillingChannel(10)
+        for batch in range(5):
+            c.put(['rows', [(batch, i) for i in range(10)]])
+        c.close()
+        self.assertRaises(channel.ChannelClosed, c.put, ['rows', [(0, 0)]])
+
+
+if __name__ == '__main__':
+    unittest.main()
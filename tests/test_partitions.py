@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import decimal
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tde import TdeGenerator
+
+
+LOWER_PATTERN = re.compile(r'c >= (\S+?)[)\s]')
+UPPER_PATTERN = re.compile(r'c < (\S+?)[)\s]')
+
+
+def get_bounds(queries):
+    return [(LOWER_PATTERN.search(q + ' '), UPPER_PATTERN.search(q + ' ')) for q in queries]
+
+
+class PartitionQueriesTest(unittest.TestCase):
+    def assert_contiguous(self, lower, upper, partitions):
+        queries = TdeGenerator.get_partition_queries('SELECT c FROM t', 'c', lower, upper, partitions)
+        bounds = get_bounds(queries)
+        self.assertIsNone(bounds[0][0])
+        self.assertIsNone(bounds[-1][1])
+        for (lower_match, upper_match), (next_lower, next_upper) in zip(bounds, bounds[1:]):
+            self.assertEqual(upper_match.group(1), next_lower.group(1))
+
+    def test_float_bounds_are_shared(self):
+        rnd = random.Random(0)
+        for i in xrange(2000):
+            lower = rnd.uniform(-1e6, 1e6)
+            self.assert_contiguous(lower, lower + rnd.uniform(1, 1e6), rnd.randint(2, 16))
+
+    def test_decimal_bounds_are_shared(self):
+        self.assert_contiguous(decimal.Decimal('0.1'), decimal.Decimal('1000.7'), 7)
+
+    def test_int_bounds_are_shared(self):
+        self.assert_contiguous(1, 20000, 4)
+        self.assert_contiguous(1, 3, 8)
+
+    def test_first_partition_reads_nulls(self):
+        queries = TdeGenerator.get_partition_queries('SELECT c FROM t;', 'c', 1, 100, 4)
+        self.assertIn('c IS NULL', queries[0])
+        self.assertNotIn('IS NULL', ''.join(queries[1:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
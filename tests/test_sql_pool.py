@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sql
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.connections = list()
+
+    def tearDown(self):
+        sql.close_pools()
+        for conn in self.connections:
+            conn.close()
+
+    def connect(self):
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.connections.append(conn)
+        return conn
+
+    @staticmethod
+    def is_open(conn):
+        try:
+            conn.execute('SELECT 1')
+            return True
+        except sqlite3.ProgrammingError:
+            return False
+
+    def test_reuses_returned_connection(self):
+        pool = sql.ConnectionPool(self.connect, max_size=2)
+        conn = pool.checkout()
+        pool.checkin(conn)
+        self.assertIs(pool.checkout(), conn)
+        self.assertEqual(len(self.connections), 1)
+
+    def test_checkout_blocks_at_max_size(self):
+        pool = sql.ConnectionPool(self.connect, max_size=1)
+        conn = pool.checkout()
+        checked_out = list()
+        waiter = threading.Thread(target=lambda: checked_out.append(pool.checkout()))
+        waiter.start()
+        time.sleep(0.2)
+        self.assertEqual(checked_out, [])
+        pool.checkin(conn)
+        waiter.join(5)
+        self.assertEqual(checked_out, [conn])
+        self.assertEqual(len(self.connections), 1)
+
+    def test_discarded_connection_frees_a_slot(self):
+        pool = sql.ConnectionPool(self.connect, max_size=1)
+        conn = pool.checkout()
+        pool.checkin(conn, discard=True)
+        self.assertFalse(self.is_open(conn))
+        self.assertIsNot(pool.checkout(), conn)
+
+    def test_idle_connections_expire(self):
+        pool = sql.ConnectionPool(self.connect, max_size=1, idle_timeout=0.05)
+        conn = pool.checkout()
+        pool.checkin(conn)
+        time.sleep(0.1)
+        self.assertIsNot(pool.checkout(), conn)
+        self.assertFalse(self.is_open(conn))
+
+    def test_unhealthy_connection_is_discarded(self):
+        pool = sql.ConnectionPool(self.connect, max_size=1)
+        conn = pool.checkout()
+        pool.checkin(conn)
+        # The server dropped the idle connection.
+        conn.close()
+        fresh = pool.checkout()
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(self.is_open(fresh))
+        self.assertEqual(len(self.connections), 2)
+
+    def test_connection_is_discarded_after_an_error(self):
+        pool = sql.ConnectionPool(self.connect, max_size=1)
+        with self.assertRaises(sqlite3.OperationalError):
+            with pool.connection() as conn:
+                conn.execute('SELECT * FROM missing')
+        self.assertFalse(self.is_open(conn))
+        with pool.connection() as fresh:
+            self.assertIsNot(fresh, conn)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'Forked workers only exist where os.fork does.')
+    def test_forked_child_gets_its_own_pools(self):
+        pool = sql.get_pool('sqlite', self.connect)
+        self.assertIs(sql.get_pool('sqlite', self.connect), pool)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(read_fd)
+                child_pool = sql.get_pool('sqlite', self.connect)
+                os.write(write_fd, '1' if child_pool is not pool and sql.get_pool('sqlite', self.connect) is child_pool else '0')
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        result = os.read(read_fd, 1)
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+        self.assertEqual(result, '1')
+        self.assertIs(sql.get_pool('sqlite', self.connect), pool)
+
+
+if __name__ == '__main__':
+    unittest.main()
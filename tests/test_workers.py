@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+from multiprocessing import Process, Queue
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import channel
+import metrics
+import tde
+
+
+def _finishing_worker(worker_queue, idx):
+    worker_queue.put(['rows', [(idx, 1), (idx, 2)]])
+    worker_queue.put(['done', idx, 2, 0.0, None])
+
+
+def _dying_worker(worker_queue, idx):
+    # Leaves without reporting, as a worker killed by the OOM killer or a crashing driver would.
+    os._exit(3)
+
+
+class ForwardWorkerBatchesTest(unittest.TestCase):
+    def setUp(self):
+        self.interval = tde.WORKER_POLL_INTERVAL
+        tde.WORKER_POLL_INTERVAL = 0.1
+
+    def tearDown(self):
+        tde.WORKER_POLL_INTERVAL = self.interval
+
+    def forward(self, targets):
+        generator = tde.TdeGenerator(None, None, None)
+        generator.stats = metrics.PipelineStats()
+        worker_queue = Queue()
+        output_queue = channel.BatchChannel(100)
+        workers = [Process(target=target, args=(worker_queue, idx)) for idx, target in enumerate(targets)]
+        for w in workers:
+            w.start()
+        try:
+            row_count = generator.forward_worker_batches(worker_queue, workers, output_queue, 'Partition')
+        finally:
+            for w in workers:
+                w.join()
+        return generator, row_count
+
+    def test_finished_workers(self):
+        generator, row_count = self.forward([_finishing_worker, _finishing_worker])
+        self.assertEqual(row_count, 4)
+        self.assertEqual(generator.errors, [])
+        self.assertEqual(generator.stats.rows_read, 4)
+
+    def test_dead_worker_fails_instead_of_hanging(self):
+        generator, row_count = self.forward([_finishing_worker, _dying_worker])
+        self.assertEqual(row_count, 2)
+        self.assertEqual(len(generator.errors), 1)
+        self.assertIn('Partition 1', generator.errors[0])
+        self.assertIn('code 3', generator.errors[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
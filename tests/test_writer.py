@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import stub_tableausdk
+stub_tableausdk.install()
+
+import tde
+
+
+METADATA = [('id', int, None, 10, 10, 0, True), ('name', unicode, None, 50, 50, 0, True)]
+
+
+class FileExtract(stub_tableausdk.Extract):
+    # Commits the tables' columns and row counts to the file on close, as the Extract API commits rows.
+    def __init__(self, path):
+        stub_tableausdk.Extract.__init__(self, path)
+        if os.path.exists(path):
+            with open(path) as f:
+                for name, state in json.load(f).items():
+                    definition = stub_tableausdk.TableDefinition()
+                    for column_name, column_type in state['columns']:
+                        definition.addColumn(column_name, column_type)
+                    self.addTable(name, definition).row_count = state['rows']
+
+    def close(self):
+        if self._handle is not None:
+            with open(self.path, 'w') as f:
+                json.dump(dict((name, {'columns': t.table_definition.columns, 'rows': t.row_count})
+                               for name, t in self.tables.items()), f)
+        stub_tableausdk.Extract.close(self)
+
+
+class FailingSinkError(Exception):
+    pass
+
+
+class TdeWriterFailureTest(unittest.TestCase):
+    def setUp(self):
+        tde.load_sdk()
+        self.extract_class = tde.Extract
+        tde.Extract = FileExtract
+        self.work_dir = tempfile.mkdtemp()
+        self.extract_path = os.path.join(self.work_dir, 'test.tde')
+
+    def tearDown(self):
+        tde.Extract = self.extract_class
+        shutil.rmtree(self.work_dir)
+
+    def write(self, rows, append=False, fail=False):
+        with tde.TdeWriter(self.extract_path, append=append) as writer:
+            writer.set_metadata(METADATA)
+            writer.write_rows(rows)
+            if fail:
+                raise FailingSinkError()
+
+    def get_rows(self):
+        with open(self.extract_path) as f:
+            return json.load(f)['Extract']['rows']
+
+    def test_append(self):
+        self.write([(1, u'a'), (2, u'b')])
+        self.write([(3, u'c')], append=True)
+        self.assertEqual(self.get_rows(), 3)
+        self.assertFalse(os.path.exists(self.extract_path + '.bak'))
+
+    def test_failed_append_keeps_committed_extract(self):
+        self.write([(1, u'a'), (2, u'b')])
+        self.assertRaises(FailingSinkError, self.write, [(3, u'c')], True, True)
+        self.assertEqual(self.get_rows(), 2)
+        self.assertFalse(os.path.exists(self.extract_path + '.bak'))
+
+    def test_failed_rebuild_keeps_previous_extract(self):
+        self.write([(1, u'a'), (2, u'b')])
+        self.assertRaises(FailingSinkError, self.write, [(3, u'c')], False, True)
+        self.assertEqual(self.get_rows(), 2)
+
+    def test_failed_first_run_leaves_no_extract(self):
+        self.assertRaises(FailingSinkError, self.write, [(1, u'a')], False, True)
+        self.assertFalse(os.path.exists(self.extract_path))
+
+    def test_aborted_run_keeps_committed_extract(self):
+        self.write([(1, u'a'), (2, u'b')])
+        with tde.TdeWriter(self.extract_path, append=True) as writer:
+            writer.set_metadata(METADATA)
+            writer.write_rows([(3, u'c')])
+            writer.abort()
+        self.assertEqual(self.get_rows(), 2)
+
+    def test_failed_run_restores_last_checkpoint(self):
+        self.write([(1, u'a')])
+        committed = list()
+        with self.assertRaises(FailingSinkError):
+            with tde.TdeWriter(self.extract_path, append=True) as writer:
+                writer.set_metadata(METADATA)
+                writer.write_rows([(2, u'b'), (3, u'c')])
+                writer.flush(lambda: committed.append(self.get_rows()))
+                writer.write_rows([(4, u'd')])
+                raise FailingSinkError()
+        self.assertEqual(committed, [3])
+        self.assertEqual(self.get_rows(), 3)
+        self.assertEqual(os.listdir(self.work_dir), ['test.tde'])
+
+    def test_failed_checkpoint_restores_previous_one(self):
+        self.write([(1, u'a')])
+
+        def save_checkpoint():
+            raise FailingSinkError()
+
+        with self.assertRaises(FailingSinkError):
+            with tde.TdeWriter(self.extract_path, append=True) as writer:
+                writer.set_metadata(METADATA)
+                writer.write_rows([(2, u'b')])
+                writer.flush(save_checkpoint)
+        self.assertEqual(self.get_rows(), 1)
+        self.assertEqual(os.listdir(self.work_dir), ['test.tde'])
+
+
+if __name__ == '__main__':
+    unittest.main()